@@ -0,0 +1,52 @@
+# Mede o custo de autenticação por requisição (token_required) com e sem o cache de JWT.
+# Uso: python bench/bench_auth.py [--requests 20000]
+import os
+import sys
+import time
+import argparse
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore') # chaves HMAC curtas de exemplo geram InsecureKeyLengthWarning
+
+import server
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    for _ in range(n): fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / n * 1e6:9.2f} us/op  ({n / elapsed:,.0f} ops/s)")
+    return elapsed / n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+    n = args.requests
+
+    app = server.app
+    with app.app_context():
+        token = server.create_jwt_token(app.config['PREDEFINED_ADMIN_USERNAME'])
+        cache = server.token_cache
+
+        print("decode_jwt_token:")
+        def uncached():
+            cache.evict(token)
+            server.decode_jwt_token(token)
+        before = timed("  sem cache (jwt.decode a cada chamada)", n, uncached)
+        server.decode_jwt_token(token)
+        after = timed("  com cache (token já verificado)", n, lambda: server.decode_jwt_token(token))
+        print(f"  redução por requisição: {(before - after) * 1e6:.2f} us ({before / after:.1f}x)")
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    print("GET /api/user/profile (test client, requisição completa):")
+    before = timed("  sem cache", n // 4, lambda: (cache.evict(token), client.get('/api/user/profile', headers=headers)))
+    after = timed("  com cache", n // 4, lambda: client.get('/api/user/profile', headers=headers))
+    print(f"  redução por requisição: {(before - after) * 1e6:.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# Compara o custo de serializar respostas grandes (catálogo, pedidos, usuários) com os providers JSON:
+# o padrão do Flask (stdlib, chaves ordenadas), o stdlib compacto e o orjson.
+# Uso: python bench/bench_json.py [--items 10000] [--orders 5000] [--users 10000] [--repeat 20]
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import warnings
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import CompactJSONProvider, OrjsonProvider, orjson
+
+
+def make_items(n):
+    now = datetime.utcnow()
+    return [{"item_id": str(uuid.uuid4()), "name": f"Awesome Gadget {i}",
+             "description": "Um gadget incrível para o dia a dia, com bateria de longa duração",
+             "price": round(random.uniform(10, 500), 2), "stock": random.randint(0, 150),
+             "created_at": (now - timedelta(seconds=i)).isoformat()} for i in range(n)]
+
+
+def make_orders(n, items):
+    now = datetime.utcnow()
+    orders = []
+    for i in range(n):
+        lines = random.sample(items, 3)
+        orders.append({
+            "order_id": str(uuid.uuid4()), "username": f"simuser_{i}",
+            "items": [{"item_id": item["item_id"], "name": item["name"], "quantity": 1,
+                       "price_at_purchase": item["price"]} for item in lines],
+            "total_amount": round(sum(item["price"] for item in lines), 2),
+            "shipping_address": "Rua das Flores, 123, Apto 45, São Paulo - SP, 01234-567",
+            "status": "paid", "created_at": (now - timedelta(seconds=i)).isoformat(),
+            "payment_method": "credit_card", "payment_details_masked": "Card ending with 4242",
+            "user_full_name": "Maria da Silva", "user_email": f"simuser_{i}@example.com"})
+    return {"orders": orders, "page": 1, "per_page": n, "total_orders": n, "next_cursor": None}
+
+
+def make_users(n):
+    now = datetime.utcnow().isoformat()
+    users = [{"username": f"simuser_{i}", "email": f"simuser_{i}@example.com", "full_name": "João Pereira",
+              "address": "Avenida Paulista, 1000, São Paulo - SP", "is_admin": False, "created_at": now}
+             for i in range(n)]
+    return {"users": users, "page": 1, "per_page": n, "total_users": n, "total_pages": 1, "next_cursor": None}
+
+
+def timed(fn, repeat):
+    fn() # aquecimento
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    items = make_items(args.items)
+    payloads = [("catálogo (/api/items)", items), ("pedidos (/api/admin/purchases)", make_orders(args.orders, items)),
+                ("usuários (/api/admin/users)", make_users(args.users))]
+
+    app = Flask(__name__)
+    providers = [("flask padrão (stdlib, sort_keys)", DefaultJSONProvider(app)),
+                 ("stdlib compacto", CompactJSONProvider(app))]
+    if orjson is not None:
+        providers.append(("orjson compacto", OrjsonProvider(app)))
+    else:
+        print("orjson não instalado: comparando só os providers da stdlib.")
+
+    with app.app_context():
+        for label, payload in payloads:
+            print(f"{label}:")
+            baseline = None
+            for name, provider in providers:
+                size = len(provider.response(payload).get_data())
+                elapsed = timed(lambda: provider.response(payload), args.repeat)
+                baseline = baseline or elapsed
+                print(f"  {name:<34} {elapsed * 1000:8.2f} ms  {size / 1024:9.1f} KiB  {baseline / elapsed:5.1f}x")
+
+            loads_provider = providers[-1][1]
+            body = loads_provider.dumps(payload)
+            stdlib = timed(lambda: providers[0][1].loads(body), args.repeat)
+            fast = timed(lambda: loads_provider.loads(body), args.repeat)
+            print(f"  loads: stdlib {stdlib * 1000:.2f} ms, {providers[-1][0]} {fast * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
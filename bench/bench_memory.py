@@ -0,0 +1,98 @@
+# Mede a memória por registro guardado no MemoryStore: dicts com timestamps ISO (formato antigo)
+# contra os registros com __slots__ e timestamps inteiros de records.py. Os dois lados partem do
+# mesmo payload que o servidor monta; a medida (tracemalloc) inclui as strings de cada registro.
+# Uso: python bench/bench_memory.py [--orders 1000000] [--lines 3] [--users 100000] [--items 10000] [--reviews 100000]
+import gc
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from records import User, Item, Review, Order
+
+START = datetime(2024, 1, 1)
+ADDRESS = "Rua das Flores, 123, Apto 45, São Paulo - SP, 01234-567"
+
+
+def iso(i):
+    return (START + timedelta(seconds=i, microseconds=random.randrange(1, 1000000))).isoformat()
+
+
+def make_user(i):
+    return {"password_hash": "scrypt:32768:8:1$" + uuid.uuid4().hex + "$" + uuid.uuid4().hex * 4,
+            "email": f"simuser_{i}@example.com", "full_name": "Maria da Silva", "address": ADDRESS,
+            "is_admin": False, "created_at": iso(i)}
+
+
+def make_item(i):
+    return {"item_id": str(uuid.uuid4()), "name": f"Awesome Gadget {i}",
+            "description": "Um gadget incrível para o dia a dia, com bateria de longa duração",
+            "price": round(random.uniform(10, 500), 2), "stock": random.randint(0, 150), "created_at": iso(i)}
+
+
+def make_review(i, items, num_users):
+    return {"item_id": random.choice(items)["item_id"], "username": f"simuser_{i % num_users}",
+            "rating": random.randint(1, 5), "comment": "Muito bom, recomendo!", "created_at": iso(i)}
+
+
+def make_order(i, items, num_users, num_lines):
+    # Como no checkout: username vem do token (string nova a cada requisição); nome do item e
+    # endereço são referências às strings do catálogo e do perfil
+    lines = [{"item_id": item["item_id"], "name": item["name"], "quantity": random.randint(1, 3),
+              "price_at_purchase": item["price"]} for item in random.sample(items, num_lines)]
+    return {"order_id": str(uuid.uuid4()), "username": f"simuser_{i % num_users}", "items": lines,
+            "total_amount": round(sum(line["price_at_purchase"] * line["quantity"] for line in lines), 2),
+            "shipping_address": ADDRESS, "status": "paid", "created_at": iso(i),
+            "payment_method": "card", "payment_details_masked": f"Card ending with {random.randint(1000, 9999)}"}
+
+
+def measure(n, build):
+    # Bytes vivos por registro depois de construir n registros (o payload temporário já foi liberado)
+    gc.collect()
+    random.seed(42)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    records = [build(i) for i in range(n)]
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del records
+    return used / n, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--lines', type=int, default=3)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--reviews', type=int, default=100000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    items = [make_item(i) for i in range(max(args.items, args.lines))]
+    cases = [
+        ("users", args.users, make_user, User),
+        ("items", args.items, make_item, Item),
+        ("reviews", args.reviews, lambda i: make_review(i, items, args.users), Review),
+        (f"orders ({args.lines} linhas)", args.orders, lambda i: make_order(i, items, args.users, args.lines), Order),
+    ]
+    print(f"{'registro':<20} {'quantidade':>10} {'dict (B/reg)':>13} {'slots (B/reg)':>14} {'economia':>9} {'total dict':>11} {'total slots':>12}")
+    for label, n, make, record_class in cases:
+        if n <= 0: continue
+        before, _ = measure(n, make)
+        after, _ = measure(n, lambda i: record_class.from_dict(make(i)))
+        print(f"{label:<20} {n:>10,} {before:>13,.0f} {after:>14,.0f} {1 - after / before:>8.0%} "
+              f"{before * n / 2**20:>8,.0f} MiB {after * n / 2**20:>8,.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
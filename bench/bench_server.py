@@ -0,0 +1,310 @@
+# Benchmark dos endpoints do server.py com o store pré-populado (usuários, itens, pedidos, reviews).
+# Modo 'client': test client do Flask, sem rede (mede só o app). Modo 'server': o app num servidor HTTP
+# local (werkzeug, threaded, keep-alive) no mesmo processo, com as requisições feitas por HTTP.
+# Por endpoint (nome da view no server.py): ops/s e latência (média, p50, p95, p99) de requisições em
+# sequência; a preparação de cada requisição (carrinho do checkout, pedido a pagar...) fica fora da medida.
+# Escalas: small = 1k, medium = 100k, large = 1M usuários/itens/pedidos (--users/--items/--orders sobrescrevem;
+# list_items devolve o catálogo inteiro, então com 1M itens cada resposta tem centenas de MB).
+# --output grava o JSON; --baseline compara com um JSON anterior e sai com código 1 se algum endpoint
+# perdeu mais que --threshold de ops/s. Rate limit e teto de concorrência ficam desligados.
+# Uso: python bench/bench_server.py [--scale small] [--backend memory|sqlite] [--mode client|server]
+#      [--requests 1000] [--max-seconds 10] [--only list_items,checkout] [--output r.json] [--baseline old.json]
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import warnings
+import threading
+import subprocess
+import http.client
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.filterwarnings('ignore')
+
+SCALES = {'small': 1000, 'medium': 100000, 'large': 1000000}
+PASSWORD = "benchpassword"
+ADDRESS = "Rua das Flores, 123, Apto 45, São Paulo - SP, 01234-567"
+CARD = {"card_number": "4111111111111111", "expiry_month": "12", "expiry_year": "2030", "cvv": "123"}
+
+# prepare(i) roda fora da medida e devolve (path, body, token); token None = o da classe de auth do caso.
+# weight reduz o número de requisições de casos caros (hash de senha).
+Case = namedtuple('Case', 'name method auth status prepare weight', defaults=(1.0,))
+
+
+def new_id():
+    return str(uuid.UUID(int=random.getrandbits(128), version=4))
+
+
+def seed(server, users, items, orders, reviews):
+    store, now = server.store, server.now_timestamp()
+    password_hash = server.password_hasher.hash(PASSWORD) # um hash para todos: o seed não paga o custo por usuário
+    for i in range(users):
+        store.add_user(f"benchuser_{i}", {"password_hash": password_hash, "email": f"benchuser_{i}@example.com",
+                                          "full_name": "Maria da Silva", "address": ADDRESS, "is_admin": False,
+                                          "created_at": now - i})
+    catalog = [{"item_id": new_id(), "name": f"Bench Gadget {i}",
+                "description": "Um gadget incrível para o dia a dia, com bateria de longa duração",
+                "price": round(random.uniform(10, 500), 2), "stock": 10**9, "created_at": now - i} for i in range(items)]
+    for start in range(0, len(catalog), 10000): store.add_items(catalog[start:start + 10000])
+    # Pedidos em ordem crescente de created_at, como no checkout: o MemoryStore faz bisect nessa ordem
+    # para os filtros created_from/created_to. Um segundo entre pedidos, terminando agora.
+    first_order = now - orders * 1000000
+    for i in range(orders):
+        lines = [{"item_id": item["item_id"], "name": item["name"], "quantity": random.randint(1, 3),
+                  "price_at_purchase": item["price"]} for item in random.sample(catalog, min(3, len(catalog)))]
+        store.add_order({"order_id": new_id(), "username": f"benchuser_{i % users}", "items": lines,
+                         "total_amount": round(sum(line["price_at_purchase"] * line["quantity"] for line in lines), 2),
+                         "shipping_address": ADDRESS, "status": random.choice(('paid', 'pending_payment')),
+                         "created_at": first_order + i * 1000000})
+    for i in range(reviews):
+        store.add_review(new_id(), {"item_id": catalog[i % min(len(catalog), 100)]["item_id"],
+                                    "username": f"benchuser_{i % users}", "rating": random.randint(1, 5),
+                                    "comment": "Muito bom, recomendo!", "created_at": now - i})
+    return [item["item_id"] for item in catalog]
+
+
+def build_cases(server, item_ids, users):
+    store, user = server.store, "benchuser_0"
+    hot_item = item_ids[0] # recebe as reviews do seed
+    deep_page = max(users // 50 // 2, 1)
+    registered = iter(range(10**9))
+
+    def pending_order():
+        order_id = new_id()
+        item_id = random.choice(item_ids)
+        store.add_order({"order_id": order_id, "username": user, "total_amount": 10.0, "shipping_address": ADDRESS,
+                         "items": [{"item_id": item_id, "name": "Bench Gadget", "quantity": 1, "price_at_purchase": 10.0}],
+                         "status": "pending_payment", "created_at": server.now_timestamp()})
+        return order_id
+
+    def fill_cart(lines):
+        store.clear_cart(user)
+        for item_id in random.sample(item_ids, min(lines, len(item_ids))): store.add_to_cart(user, item_id, 1)
+
+    def removable():
+        item_id = random.choice(item_ids)
+        store.add_to_cart(user, item_id, 1)
+        return item_id
+
+    def deletable():
+        return store.add_item({"item_id": new_id(), "name": "Bench Temp", "description": "", "price": 1.0,
+                               "stock": 1, "created_at": server.now_timestamp()})["item_id"]
+
+    def fresh_token():
+        with server.app.app_context(): return server.create_jwt_token(user)
+
+    get = lambda path: lambda i: (path, None, None)
+    return [
+        Case('health_check', 'GET', None, 200, get('/')),
+        Case('metrics', 'GET', None, 200, get('/metrics')),
+        Case('login_user', 'POST', None, 200, lambda i: ('/api/user/login', {"username": user, "password": PASSWORD}, None), 0.05),
+        Case('register_user', 'POST', None, 201, lambda i: ('/api/user/register', {
+            "username": f"bench_new_{next(registered)}", "password": PASSWORD, "email": "new@example.com",
+            "full_name": "Novo Usuário", "address": ADDRESS}, None), 0.05),
+        Case('get_user_profile', 'GET', 'user', 200, get('/api/user/profile')),
+        Case('list_items', 'GET', None, 200, get('/api/items')),
+        Case('search_items', 'GET', None, 200, get('/api/items/search?q=gadget&per_page=50')),
+        Case('get_item', 'GET', None, 200, lambda i: (f'/api/item/{random.choice(item_ids)}', None, None)),
+        Case('list_item_reviews', 'GET', None, 200, get(f'/api/item/{hot_item}/reviews')),
+        Case('list_my_orders', 'GET', 'user', 200, get('/api/orders')),
+        Case('admin_list_users', 'GET', 'admin', 200, get('/api/admin/users')),
+        Case('admin_list_users[deep]', 'GET', 'admin', 200, get(f'/api/admin/users?page={deep_page}')),
+        Case('admin_list_purchases', 'GET', 'admin', 200, get('/api/admin/purchases')),
+        Case('view_cart', 'GET', 'user', 200, lambda i: (fill_cart(5) if i == 0 else None) or ('/api/cart', None, None)),
+        Case('add_item_to_cart', 'POST', 'user', 200, lambda i: ('/api/cart/item', {"item_id": random.choice(item_ids), "quantity": 1}, None)),
+        Case('add_items_to_cart', 'POST', 'user', 200, lambda i: ('/api/cart/items', {"items": [
+            {"item_id": item_id, "quantity": 1} for item_id in random.sample(item_ids, min(10, len(item_ids)))]}, None)),
+        Case('remove_item_from_cart', 'DELETE', 'user', 200, lambda i: (f'/api/cart/item/{removable()}', None, None)),
+        Case('checkout', 'POST', 'user', 201, lambda i: fill_cart(3) or ('/api/order/checkout', None, None)),
+        Case('pay_by_card', 'POST', 'user', 200, lambda i: (f'/api/order/{pending_order()}/pay/card', CARD, None)),
+        Case('pay_by_pix', 'POST', 'user', 200, lambda i: (f'/api/order/{pending_order()}/pay/pix', None, None)),
+        Case('add_review', 'POST', 'user', 201, lambda i: (f'/api/item/{random.choice(item_ids)}/review', {"rating": 4, "comment": "Bom"}, None)),
+        Case('admin_add_item', 'POST', 'admin', 201, lambda i: ('/api/admin/item', {"name": f"Bench New {i}", "price": 9.9, "stock": 5}, None)),
+        Case('admin_bulk_items', 'POST', 'admin', 200, lambda i: ('/api/admin/items', [
+            {"name": f"Bench Bulk {i}-{j}", "price": 9.9, "stock": 5} for j in range(100)], None), 0.2),
+        Case('admin_update_item_stock', 'PUT', 'admin', 200, lambda i: (f'/api/admin/item/{random.choice(item_ids)}/stock', {"stock": 10**9}, None)),
+        Case('admin_delete_item', 'DELETE', 'admin', 200, lambda i: (f'/api/admin/item/{deletable()}', None, None)),
+        Case('logout_user', 'POST', 'user', 200, lambda i: ('/api/user/logout', None, fresh_token())),
+    ]
+
+
+class ClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body, headers):
+        response = self.client.open(path, method=method, data=body, headers=headers)
+        return response.status_code, response.get_data()
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    def __init__(self, app):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        class Handler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive: uma conexão para todas as requisições
+            def log_request(self, *args): pass
+
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=Handler)
+        threading.Thread(target=self.server.serve_forever, name='bench-server', daemon=True).start()
+        self.conn = http.client.HTTPConnection('127.0.0.1', self.server.port)
+
+    def request(self, method, path, body, headers):
+        self.conn.request(method, path, body, headers)
+        response = self.conn.getresponse()
+        return response.status, response.read()
+
+    def close(self):
+        self.conn.close()
+        self.server.shutdown()
+
+
+def run_case(driver, case, tokens, requests, max_seconds):
+    latencies, statuses = [], Counter()
+    warmup = min(max(requests // 10, 1), 50)
+    deadline = None
+    for i in range(warmup + requests):
+        if i == warmup: deadline = time.perf_counter() + max_seconds
+        path, body, token = case.prepare(i)
+        headers = {}
+        token = token or tokens.get(case.auth)
+        if token: headers['Authorization'] = f"Bearer {token}"
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        status, _ = driver.request(case.method, path, body, headers)
+        elapsed = time.perf_counter() - start
+        if i < warmup: continue
+        latencies.append(elapsed)
+        statuses[status] += 1
+        if len(latencies) >= 5 and start > deadline: break
+    latencies.sort()
+    n = len(latencies)
+    pct = lambda q: latencies[min(int(q * n), n - 1)] * 1000
+    return {"method": case.method, "requests": n, "errors": n - statuses[case.status],
+            "ops_per_s": n / sum(latencies), "mean_ms": sum(latencies) / n * 1000, "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95), "p99_ms": pct(0.99), "max_ms": latencies[-1] * 1000,
+            "status": {str(code): count for code, count in sorted(statuses.items())}}
+
+
+def git_commit():
+    try:
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    # Regressão = perda de ops/s maior que threshold em relação ao baseline
+    for key in ('backend', 'mode', 'scale'):
+        if baseline['meta'].get(key) != results['meta'].get(key):
+            print(f"aviso: baseline com {key}={baseline['meta'].get(key)!r}, esta execução {results['meta'].get(key)!r}")
+    print(f"\n{'endpoint':<26} {'base ops/s':>11} {'ops/s':>11} {'variação':>9}")
+    regressions = []
+    for name, result in results['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if base is None: continue
+        change = result['ops_per_s'] / base['ops_per_s'] - 1
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = '  <-- regressão'
+        print(f"{name:<26} {base['ops_per_s']:>11,.0f} {result['ops_per_s']:>11,.0f} {change:>+9.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--items', type=int)
+    parser.add_argument('--orders', type=int)
+    parser.add_argument('--reviews', type=int, help="padrão: 1/10 da escala, concentradas em 100 itens")
+    parser.add_argument('--backend', choices=('memory', 'sqlite'), default='memory')
+    parser.add_argument('--mode', choices=('client', 'server'), default='client')
+    parser.add_argument('--requests', type=int, default=1000, help="requisições medidas por endpoint")
+    parser.add_argument('--max-seconds', type=float, default=10.0, help="tempo máximo medido por endpoint")
+    parser.add_argument('--only', help="endpoints separados por vírgula")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="arquivo JSON com os resultados")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    size = SCALES[args.scale]
+    users, items, orders = max(args.users or size, 1), max(args.items or size, 1), args.orders if args.orders is not None else size
+    reviews = args.reviews if args.reviews is not None else size // 10
+
+    # Antes de importar o server: a configuração é lida no import
+    workdir = tempfile.mkdtemp(prefix='bench_server_')
+    os.environ.update(STORAGE_BACKEND=args.backend, SQLITE_PATH=os.path.join(workdir, 'bench.db'), PERSIST_DIR='',
+                      RATE_LIMITS='', MAX_CONCURRENT_REQUESTS='0', CONCURRENCY_LIMITS='', PASSWORD_HASH_WORKERS='0')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    try:
+        import server
+        random.seed(args.seed)
+        start = time.perf_counter()
+        item_ids = seed(server, users, items, orders, reviews)
+        seed_seconds = time.perf_counter() - start
+        print(f"seed: {users:,} usuários, {items:,} itens, {orders:,} pedidos, {reviews:,} reviews em {seed_seconds:.1f}s "
+              f"({args.backend}, modo {args.mode})")
+
+        with server.app.app_context():
+            tokens = {'user': server.create_jwt_token("benchuser_0"),
+                      'admin': server.create_jwt_token(server.app.config['PREDEFINED_ADMIN_USERNAME'])}
+        cases = build_cases(server, item_ids, users)
+        if args.only:
+            selected = {name.strip() for name in args.only.split(',')}
+            cases = [case for case in cases if case.name in selected]
+
+        driver = (ServerDriver if args.mode == 'server' else ClientDriver)(server.app)
+        endpoints = {}
+        print(f"{'endpoint':<26} {'reqs':>6} {'ops/s':>9} {'média ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>6}")
+        try:
+            for case in cases:
+                result = endpoints[case.name] = run_case(driver, case, tokens, max(int(args.requests * case.weight), 5),
+                                                         args.max_seconds)
+                print(f"{case.name:<26} {result['requests']:>6} {result['ops_per_s']:>9,.0f} {result['mean_ms']:>9.3f} "
+                      f"{result['p50_ms']:>8.3f} {result['p95_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['errors']:>6}")
+        finally:
+            driver.close()
+            server.shutdown_app()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {"meta": {"commit": git_commit(), "date": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                        "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                        "backend": args.backend, "mode": args.mode,
+                        "scale": {"users": users, "items": items, "orders": orders, "reviews": reviews},
+                        "requests": args.requests, "max_seconds": args.max_seconds, "seed": args.seed,
+                        "seed_seconds": round(seed_seconds, 2)},
+               "endpoints": endpoints}
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(results, f, indent=2)
+        print(f"resultados em {args.output}")
+    failed = [name for name, result in endpoints.items() if result['errors']]
+    if failed: print(f"status inesperado em: {', '.join(failed)}")
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"regressões acima de {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import gzip
+
+try:
+    import brotli
+except ImportError: # opcional; sem brotli só oferecemos gzip
+    brotli = None
+
+# --- Compressão de respostas ---
+# Negociada pelo Accept-Encoding e aplicada só acima de um tamanho mínimo: corpos pequenos não
+# compensam a CPU nem os bytes do cabeçalho gzip. Respostas em streaming não são comprimidas aqui.
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html', 'text/csv')
+
+
+class Compressor:
+    def __init__(self, encodings=('br', 'gzip'), min_size=1024, gzip_level=6, brotli_level=4):
+        # encodings em ordem de preferência; 'br' é ignorado se o módulo brotli não estiver instalado
+        self.encodings = [encoding for encoding in encodings if encoding == 'gzip' or (encoding == 'br' and brotli)]
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_level = brotli_level
+
+    def negotiate(self, request):
+        # Melhor codificação aceita pelo cliente (respeita q=0), ou None
+        if not self.encodings: return None
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compress(self, body, encoding):
+        if encoding == 'br': return brotli.compress(body, quality=self.brotli_level)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0) # mtime fixo: saída determinística
+
+    def should_compress(self, response):
+        return (response.status_code == 200 and not response.is_streamed and not response.direct_passthrough
+                and 'Content-Encoding' not in response.headers and response.mimetype in COMPRESSIBLE_MIMETYPES
+                and (response.content_length or 0) >= self.min_size)
+
+    def apply(self, request, response):
+        # Hook de after_request
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES: return response
+        response.vary.add('Accept-Encoding')
+        if not self.should_compress(response): return response
+        encoding = self.negotiate(request)
+        if encoding is None: return response
+        response.set_data(self.compress(response.get_data(), encoding))
+        set_encoding(response, encoding)
+        return response
+
+
+def set_encoding(response, encoding):
+    # A representação comprimida precisa de um ETag próprio (ex. "abc" -> "abc-gzip")
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not etag.endswith(f"-{encoding}"): response.set_etag(f"{etag}-{encoding}", weak)
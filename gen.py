@@ -2,9 +2,23 @@ import requests
 import time
 import random
 import threading
+import asyncio
+import json
 import os
+import multiprocessing
+import queue
+import re
+import itertools
+from collections import deque
 from faker import Faker
 from dotenv import load_dotenv
+from gen_stats import Stats, format_summary, format_table, write_report
+from gen_payloads import build_payloads, extract_ids, remap_ids, collect_ids, iter_records, RecordWriter
+
+try:
+    import aiohttp
+except ImportError: # motor async é opcional; sem aiohttp usamos threads
+    aiohttp = None
 
 load_dotenv()
 
@@ -13,13 +27,54 @@ NUM_USERS = int(os.getenv("NUM_SIMULTANEOUS_USERS", "3"))
 DELAY_MIN = float(os.getenv("REQUEST_DELAY_MIN_S", "0.5"))
 DELAY_MAX = float(os.getenv("REQUEST_DELAY_MAX_S", "2.0"))
 RUN_INDEFINITELY = os.getenv("RUN_DURATION_SECONDS", "0") == "0"
+RUN_DURATION = float(os.getenv("RUN_DURATION_SECONDS", "0"))
+ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
+# Motor de execução: 'async' (aiohttp, um processo, milhares de sessões), 'thread' (uma thread por usuário)
+# ou 'auto' (async se o aiohttp estiver instalado)
+ENGINE = os.getenv("GEN_ENGINE", "auto")
+MAX_CONNECTIONS = int(os.getenv("GEN_MAX_CONNECTIONS", "1000")) # conexões keep-alive no pool do motor async
+VERBOSE = os.getenv("GEN_VERBOSE", "1") == "1" # mensagens por passo; desligue com muitos usuários
+# Multiprocesso: cada processo roda sua fatia dos usuários e do orçamento de requisições/s (0 = sem limite)
+NUM_PROCESSES = int(os.getenv("GEN_PROCESSES", "1"))
+MAX_RPS = float(os.getenv("GEN_MAX_RPS", "0"))
+REPORT_INTERVAL = float(os.getenv("GEN_REPORT_INTERVAL_S", "5"))
+# Modo open-loop: sessões começam numa taxa de chegada definida pelo perfil, independente do tempo de
+# resposta do servidor (evita coordinated omission). Em 'closed' (padrão) vale NUM_SIMULTANEOUS_USERS.
+MODE = os.getenv("GEN_MODE", "closed")
+LOAD_PROFILE = os.getenv("GEN_LOAD_PROFILE", "constant") # constant, ramp, step ou spike
+ARRIVAL_RATE = float(os.getenv("GEN_ARRIVAL_RATE", "1")) # sessões/s (taxa base)
+PEAK_RATE = float(os.getenv("GEN_PEAK_RATE", "0")) or ARRIVAL_RATE # taxa final (ramp/step) ou do pico (spike)
+PROFILE_STEPS = int(os.getenv("GEN_STEPS", "5"))
+SPIKE_START = float(os.getenv("GEN_SPIKE_START_S", "30"))
+SPIKE_DURATION = float(os.getenv("GEN_SPIKE_DURATION_S", "10"))
+MAX_SESSIONS = int(os.getenv("GEN_MAX_SESSIONS", "10000")) # limite de sessões ativas por processo no open-loop
+REPORT_FILE = os.getenv("GEN_REPORT_FILE", "") # relatório final por endpoint (.json ou .csv) para comparar builds
+# Pool de payloads do Faker gerado antes do início (0 = gerar a cada sessão); com GEN_PAYLOAD_FILE o pool é
+# carregado desse arquivo se existir, ou gerado e salvo nele
+PAYLOAD_POOL_SIZE = int(os.getenv("GEN_PAYLOAD_POOL_SIZE", "1000"))
+PAYLOAD_FILE = os.getenv("GEN_PAYLOAD_FILE", "")
+SEED_ITEMS = int(os.getenv("GEN_SEED_ITEMS", "0")) # itens criados no início via POST /admin/items (lotes de 1000)
+# Gravação/replay de sessões em JSONL (formato em gen_payloads.py). GEN_REPLAY_SPEED: 1 = tempos gravados,
+# 2 = duas vezes mais rápido, 0 = o mais rápido possível (cada sessão ainda manda suas requisições em ordem)
+RECORD_FILE = os.getenv("GEN_RECORD_FILE", "")
+REPLAY_FILE = os.getenv("GEN_REPLAY_FILE", "")
+REPLAY_SPEED = float(os.getenv("GEN_REPLAY_SPEED", "1"))
+# Segundos que uma requisição do replay espera pelo login ou pelos IDs de que depende; depois é descartada
+REPLAY_WAIT_TIMEOUT = float(os.getenv("GEN_REPLAY_WAIT_TIMEOUT", "10"))
 
 
 fake = Faker('pt_BR')
 user_tokens = {}
 admin_token_global = None
 available_item_ids_global = []
+items_etag_global = None # ETag do último catálogo recebido (GET condicional)
+catalog_seeded = False # GEN_SEED_ITEMS já enviado (no modo multiprocesso o pai semeia antes do fork)
 admin_login_lock = threading.Lock() # Para evitar múltiplas tentativas de login do admin simultaneamente
+stats = Stats() # Estatísticas deste processo
+worker_tag = "0" # Distingue os usernames gerados por processos diferentes
+payloads = None # PayloadPool (ou InlinePayloads), montado em main() antes de criar os processos
+recorder = None # RecordWriter quando GEN_RECORD_FILE está definido
+session_ids = itertools.count(1)
 
 # Lista de User-Agents comuns para simular diferentes navegadores
 COMMON_USER_AGENTS = [
@@ -32,57 +87,253 @@ COMMON_USER_AGENTS = [
     "Mozilla/5.0 (iPad; CPU OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/91.0.4472.80 Mobile/15E148 Safari/604.1"
 ]
 
-def req(method, endpoint, data=None, token_for_user=None, is_admin_req=False):
+def log(message):
+    if VERBOSE: print(message)
+
+# --- Cenários e motores ---
+# Os cenários (user_simulation, admin_actions_simulation, ...) são geradores: `yield Call(...)` pede uma
+# requisição HTTP e recebe a resposta; `yield Pause(s)` pede uma pausa. O mesmo cenário roda tanto no
+# motor de threads (requests.Session por thread) quanto no motor async (aiohttp com pool keep-alive).
+class Call:
+    __slots__ = ('method', 'url', 'data', 'headers', 'endpoint', 'auth', 'intended')
+
+    def __init__(self, method, url, data, headers, endpoint, auth=None, intended=None):
+        # endpoint: template usado nas estatísticas, ex. "POST /order/{id}/pay/card"
+        # auth: username dono do token enviado (gravação); intended: perf_counter em que a requisição
+        # deveria sair (replay), de onde a latência passa a contar
+        self.method, self.url, self.data, self.headers, self.endpoint = method, url, data, headers, endpoint
+        self.auth, self.intended = auth, intended
+
+ID_SEGMENT = re.compile(r'/(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)(?=/|$)')
+
+def endpoint_template(method, endpoint):
+    return f"{method} {ID_SEGMENT.sub('/{id}', endpoint.split('?', 1)[0])}"
+
+class Pause:
+    __slots__ = ('seconds',)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+class GenResponse:
+    # Resposta já lida por completo, com a mesma interface nos dois motores
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code, headers, content):
+        self.status_code, self.headers, self.content = status_code, headers, content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+class CallError(Exception):
+    pass
+
+def pause(min_s, max_s):
+    yield Pause(random.uniform(min_s, max_s))
+
+class RatePacer:
+    # Espaça as requisições deste processo para não passar de `rate` req/s; devolve quanto esperar
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if not self.interval: return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now) + self.interval
+            return self._next - self.interval - now
+
+pacer = RatePacer(MAX_RPS)
+
+class ArrivalProfile:
+    # Taxa de chegada de sessões em função do tempo decorrido (s). `scale` divide a taxa entre processos.
+    def __init__(self, kind, base_rate, peak_rate, duration, steps=5, spike_start=30.0, spike_duration=10.0, scale=1.0):
+        if kind not in ("constant", "ramp", "step", "spike"):
+            raise ValueError(f"Unknown GEN_LOAD_PROFILE: {kind!r}")
+        if kind in ("ramp", "step") and duration <= 0:
+            raise ValueError(f"GEN_LOAD_PROFILE={kind} requires RUN_DURATION_SECONDS > 0")
+        self.kind, self.base_rate, self.peak_rate, self.duration = kind, base_rate, peak_rate, duration
+        self.steps, self.spike_start, self.spike_duration, self.scale = max(steps, 1), spike_start, spike_duration, scale
+
+    def rate_at(self, t):
+        if self.kind == "ramp":
+            rate = self.base_rate + (self.peak_rate - self.base_rate) * min(t / self.duration, 1.0)
+        elif self.kind == "step":
+            step = min(int(t / (self.duration / self.steps)), self.steps - 1)
+            rate = self.base_rate + (self.peak_rate - self.base_rate) * step / max(self.steps - 1, 1)
+        elif self.kind == "spike" and self.spike_start <= t < self.spike_start + self.spike_duration:
+            rate = self.peak_rate
+        else:
+            rate = self.base_rate
+        return rate * self.scale
+
+    def arrivals(self):
+        # Instantes pretendidos de início de cada sessão, em segundos desde o início
+        t = 0.0
+        while self.duration <= 0 or t < self.duration:
+            rate = self.rate_at(t)
+            if rate <= 0:
+                t += 0.1
+                continue
+            yield t
+            t += 1.0 / rate
+
+    def describe(self):
+        return f"{self.kind} {self.base_rate:g}->{self.peak_rate:g} sessions/s" if self.kind != "constant" \
+            else f"constant {self.base_rate:g} sessions/s"
+
+thread_local = threading.local()
+
+def run_scenario_sync(scenario, intended_start=None):
+    # Motor de threads: uma requests.Session por thread reaproveita conexões (keep-alive).
+    # intended_start (perf_counter): no open-loop, a latência da 1ª requisição conta a partir do horário
+    # em que a sessão deveria ter começado, incluindo qualquer atraso do próprio gerador.
+    session = getattr(thread_local, 'session', None)
+    if session is None:
+        session = thread_local.session = requests.Session()
+    session_id = f"{worker_tag}-{next(session_ids)}" if recorder else None
+    result = None
+    try:
+        while True:
+            step = scenario.send(result)
+            if isinstance(step, Pause):
+                time.sleep(step.seconds)
+                result = None
+                continue
+            wait = pacer.delay()
+            if wait > 0: time.sleep(wait)
+            sent_at = time.perf_counter()
+            start, intended_start = step.intended or intended_start or sent_at, None
+            try:
+                response = session.request(step.method, step.url, json=step.data, headers=step.headers, timeout=10)
+                result = GenResponse(response.status_code, response.headers, response.content)
+                stats.record(step.endpoint, response.status_code, time.perf_counter() - start)
+            except requests.exceptions.RequestException as e:
+                result = CallError(e)
+                stats.record(step.endpoint, None, time.perf_counter() - start)
+            if session_id: record_call(session_id, step, result, sent_at)
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        if session_id: recorder.write({"session": session_id, "end": True})
+
+async def run_scenario_async(scenario, session, intended_start=None):
+    session_id = f"{worker_tag}-{next(session_ids)}" if recorder else None
+    result = None
+    try:
+        while True:
+            step = scenario.send(result)
+            if isinstance(step, Pause):
+                await asyncio.sleep(step.seconds)
+                result = None
+                continue
+            wait = pacer.delay()
+            if wait > 0: await asyncio.sleep(wait)
+            sent_at = time.perf_counter()
+            start, intended_start = step.intended or intended_start or sent_at, None
+            try:
+                async with session.request(step.method, step.url, json=step.data, headers=step.headers) as response:
+                    result = GenResponse(response.status, response.headers, await response.read())
+                stats.record(step.endpoint, result.status_code, time.perf_counter() - start)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                result = CallError(e)
+                stats.record(step.endpoint, None, time.perf_counter() - start)
+            if session_id: record_call(session_id, step, result, sent_at)
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        if session_id: recorder.write({"session": session_id, "end": True})
+
+def response_data(response):
+    # Corpo JSON de objeto da resposta, ou None (erro de conexão, 304, listas, HTML...)
+    if isinstance(response, GenResponse) and response.content[:1] == b'{':
+        try:
+            return response.json()
+        except ValueError:
+            pass
+    return None
+
+def record_call(session_id, step, result, sent_at):
+    record = {"session": session_id, "method": step.method, "path": step.url[len(API_BASE_URL):],
+              "body": step.data, "user": step.auth}
+    if isinstance(result, GenResponse): record["status"] = result.status_code
+    captures = extract_ids(response_data(result))
+    if captures: record["captures"] = captures
+    recorder.write(record, sent_at)
+
+def req(method, endpoint, data=None, token_for_user=None, is_admin_req=False, extra_headers=None):
     url = f"{API_BASE_URL}{endpoint}"
     headers = {"Content-Type": "application/json", "User-Agent": random.choice(COMMON_USER_AGENTS)}
-    
-    token_to_use = None
+    if extra_headers:
+        headers.update(extra_headers)
+
+    token_to_use = auth = None
     if is_admin_req and admin_token_global:
-        token_to_use = admin_token_global
+        token_to_use, auth = admin_token_global, ADMIN_USERNAME
     elif token_for_user and token_for_user in user_tokens:
-        token_to_use = user_tokens[token_for_user]
+        token_to_use, auth = user_tokens[token_for_user], token_for_user
 
     if token_to_use:
         headers['Authorization'] = f'Bearer {token_to_use}'
 
-    try:
-        # print(f"[{threading.get_ident()}] {method} {url} Data: {data}")
-        response = requests.request(method, url, json=data, headers=headers, timeout=10)
-        # print(f"[{threading.get_ident()}] Response {response.status_code} from {url}: {response.text[:100]}")
-        if response.status_code == 401 and token_for_user and token_for_user in user_tokens:
-            print(f"Token for {token_for_user} expired or invalid. Removing.")
-            del user_tokens[token_for_user]
-        elif response.status_code == 401 and is_admin_req:
-            print("Admin token expired or invalid. Attempting to re-login admin...")
-            # Tentar refazer o login do admin
-            if attempt_admin_relogin():
-                # Tentar a requisição original novamente com o novo token
-                print("Admin re-login successful. Retrying original request...")
-                headers['Authorization'] = f'Bearer {admin_token_global}' # Atualiza o header com o novo token
-                response = requests.request(method, url, json=data, headers=headers, timeout=10)
-            else:
-                print("Admin re-login failed. Original request will likely fail.")
-            del user_tokens[token_for_user]
-        return response
-    except requests.exceptions.RequestException as e:
-        print(f"Error for {url}: {e}")
+    template = endpoint_template(method, endpoint)
+    response = yield Call(method, url, data, headers, template, auth)
+    if isinstance(response, CallError):
+        print(f"Error for {url}: {response}")
         return None
-
-def initial_setup():
-    global admin_token_global, available_item_ids_global
+    if response.status_code == 401 and token_for_user and token_for_user in user_tokens:
+        print(f"Token for {token_for_user} expired or invalid. Removing.")
+        user_tokens.pop(token_for_user, None)
+    elif response.status_code == 401 and is_admin_req:
+        print("Admin token expired or invalid. Attempting to re-login admin...")
+        # Tentar refazer o login do admin
+        if (yield from attempt_admin_relogin()):
+            # Tentar a requisição original novamente com o novo token
+            print("Admin re-login successful. Retrying original request...")
+            headers['Authorization'] = f'Bearer {admin_token_global}' # Atualiza o header com o novo token
+            response = yield Call(method, url, data, headers, template, ADMIN_USERNAME)
+            if isinstance(response, CallError):
+                print(f"Error for {url}: {response}")
+                return None
+        else:
+            print("Admin re-login failed. Original request will likely fail.")
+    return response
+
+def initial_setup(fetch_items=True):
+    global admin_token_global, available_item_ids_global, items_etag_global, catalog_seeded
     # Login Admin
     admin_user = os.getenv("ADMIN_USERNAME", "admin")
     admin_pass = os.getenv("ADMIN_PASSWORD", "adminpassword")
-    resp = req("POST", "/user/login", {"username": admin_user, "password": admin_pass})
+    resp = yield from req("POST", "/user/login", {"username": admin_user, "password": admin_pass})
     if resp and resp.status_code == 200:
         admin_token_global = resp.json().get("access_token")
         print("Admin logged in.")
     else:
         print(f"Admin login failed: {resp.text if resp else 'No response'}")
 
+    # Seed catalog in bulk (uma vez por execução, não por processo)
+    if SEED_ITEMS and admin_token_global and not catalog_seeded:
+        catalog_seeded = True
+        created = 0
+        for offset in range(0, SEED_ITEMS, 1000):
+            rows = [{"name": f"Seed Item {n}", "description": payloads.description(),
+                     "price": round(random.uniform(10, 500), 2), "stock": random.randint(20, 150)}
+                    for n in range(offset, min(offset + 1000, SEED_ITEMS))]
+            resp_seed = yield from req("POST", "/admin/items", data=rows, is_admin_req=True)
+            if resp_seed and resp_seed.status_code == 200: created += resp_seed.json().get("created", 0)
+        print(f"Seeded {created} items.")
+    if not fetch_items: return
+
     # Fetch items
-    resp_items = req("GET", "/items")
+    resp_items = yield from req("GET", "/items")
     if resp_items and resp_items.status_code == 200:
+        items_etag_global = resp_items.headers.get("ETag")
         items_data = resp_items.json()
         available_item_ids_global = [item['item_id'] for item in items_data if isinstance(item, dict) and 'item_id' in item]
         print(f"Fetched {len(available_item_ids_global)} items.")
@@ -91,84 +342,78 @@ def initial_setup():
 
 def attempt_admin_relogin():
     global admin_token_global
-    # Usar um lock para garantir que apenas uma thread tente o relogin do admin por vez
-    with admin_login_lock:
-        # Verificar novamente se outro thread já não fez o relogin enquanto este esperava pelo lock
-        # (Isso é uma simplificação; uma verificação real da validade do token seria melhor se possível)
-        # Para esta simulação, vamos apenas tentar o login.
+    # Apenas uma sessão tenta o relogin do admin por vez. O lock é adquirido sem bloquear: no motor async
+    # todas as sessões compartilham uma thread, e esperar pelo lock travaria o event loop.
+    if not admin_login_lock.acquire(blocking=False):
+        print("Admin re-login already in progress elsewhere.")
+        return False
+    try:
         print("Attempting admin re-login critical section...")
         admin_user = os.getenv("ADMIN_USERNAME", "admin")
         admin_pass = os.getenv("ADMIN_PASSWORD", "adminpassword")
         # Faz a requisição de login sem usar a função 'req' para evitar recursão infinita em caso de falha no login
         login_url = f"{API_BASE_URL}/user/login"
         login_payload = {"username": admin_user, "password": admin_pass}
-        resp = requests.post(login_url, json=login_payload, headers={"Content-Type": "application/json"}, timeout=10)
-        if resp and resp.status_code == 200:
+        resp = yield Call("POST", login_url, login_payload, {"Content-Type": "application/json"}, "POST /user/login")
+        if not isinstance(resp, CallError) and resp.status_code == 200:
             admin_token_global = resp.json().get("access_token")
             return True
+    finally:
+        admin_login_lock.release()
     return False
 
 def user_simulation(user_id_prefix):
     username = f"{user_id_prefix}_{random.randint(1000,9999)}"
-    password = fake.password()
-    pii_data = { # PII
-        "email": fake.email(), "full_name": fake.name(),
-        "address": fake.address().replace("\n", ", ")
-    }
+    pii_data = payloads.user() # PII (password, email, full_name, address)
+    password = pii_data["password"]
 
     # Register
-    print(f"{username}: Registering with PII...")
-    reg_payload = {"username": username, "password": password, **pii_data}
-    req("POST", "/user/register", reg_payload)
-    time.sleep(random.uniform(DELAY_MIN, DELAY_MAX))
+    log(f"{username}: Registering with PII...")
+    reg_payload = {"username": username, **pii_data}
+    yield from req("POST", "/user/register", reg_payload)
+    yield from pause(DELAY_MIN, DELAY_MAX)
 
     # Login
-    print(f"{username}: Logging in...")
-    login_resp = req("POST", "/user/login", {"username": username, "password": password})
+    log(f"{username}: Logging in...")
+    login_resp = yield from req("POST", "/user/login", {"username": username, "password": password})
     if not (login_resp and login_resp.status_code == 200 and login_resp.json().get("access_token")):
         print(f"{username}: Login failed. Aborting.")
         return
     user_tokens[username] = login_resp.json()["access_token"]
 
     # Browse items (already fetched globally, but could simulate individual viewing)
-    print(f"{username}: Browsing items...")
-    time.sleep(random.uniform(DELAY_MIN, DELAY_MAX))
+    log(f"{username}: Browsing items...")
+    yield from pause(DELAY_MIN, DELAY_MAX)
 
-    # Add items to cart
+    # Add items to cart (um único POST com todos os itens)
     if available_item_ids_global:
         num_items_to_add = random.randint(1, min(3, len(available_item_ids_global)))
-        for _ in range(num_items_to_add):
-            item_to_add = random.choice(available_item_ids_global)
-            print(f"{username}: Adding item {item_to_add} to cart...")
-            req("POST", "/cart/item", {"item_id": item_to_add, "quantity": 1}, token_for_user=username)
-            time.sleep(random.uniform(DELAY_MIN / 2, DELAY_MAX / 2))
+        items_to_add = [{"item_id": random.choice(available_item_ids_global), "quantity": 1} for _ in range(num_items_to_add)]
+        log(f"{username}: Adding {num_items_to_add} item(s) to cart...")
+        yield from req("POST", "/cart/items", {"items": items_to_add}, token_for_user=username)
+        yield from pause(DELAY_MIN / 2, DELAY_MAX / 2)
     else:
         print(f"{username}: No items to add to cart.")
         return # End early if no items
 
     # Checkout
-    print(f"{username}: Checking out...")
-    checkout_resp = req("POST", "/order/checkout", token_for_user=username)
+    log(f"{username}: Checking out...")
+    checkout_resp = yield from req("POST", "/order/checkout", token_for_user=username)
     order_id = None
     if checkout_resp and checkout_resp.status_code == 201:
         order_id = checkout_resp.json().get("order_id")
-        print(f"{username}: Checkout successful, order ID: {order_id}")
+        log(f"{username}: Checkout successful, order ID: {order_id}")
     else:
         print(f"{username}: Checkout failed. {checkout_resp.text if checkout_resp else 'No response'}")
         return
 
     # Pay (PII for card)
     if order_id:
-        payment_pii = { # PII
-            "card_number": fake.credit_card_number(),
-            "expiry_month": fake.credit_card_expire().split("/")[0],
-            "expiry_year": "20" + fake.credit_card_expire().split("/")[1],
-            "cvv": fake.credit_card_security_code()
-        }
-        print(f"{username}: Paying for order {order_id} with card PII...")
-        req("POST", f"/order/{order_id}/pay/card", payment_pii, token_for_user=username)
+        payment_pii = payloads.card() # PII
+        log(f"{username}: Paying for order {order_id} with card PII...")
+        yield from req("POST", f"/order/{order_id}/pay/card", payment_pii, token_for_user=username)
 
-    print(f"{username}: Simulation ended.")
+    log(f"{username}: Simulation ended.")
     if username in user_tokens: # Clean up token
         del user_tokens[username]
 
@@ -178,88 +423,215 @@ def admin_actions_simulation():
         print("Admin not logged in, skipping admin actions.")
         return
 
-    print("Admin: Fetching purchases (contains PII)...")
-    resp = req("GET", "/admin/purchases", is_admin_req=True)
+    log("Admin: Fetching first page of purchases (contains PII)...")
+    resp = yield from req("GET", "/admin/purchases?per_page=50", is_admin_req=True)
     if resp and resp.status_code == 200:
-        purchases = resp.json()
-        print(f"Admin: Fetched {len(purchases)} purchases.")
+        response_data = resp.json()
+        purchases = response_data.get("orders", [])
+        log(f"Admin: Fetched {len(purchases)} purchases. Total orders: {response_data.get('total_orders', 0)}.")
         if purchases:
             sample_purchase = purchases[0]
-            print(f"  Sample PII from purchase: User '{sample_purchase.get('user_full_name')}', Address '{sample_purchase.get('shipping_address')}'")
-    time.sleep(random.uniform(DELAY_MIN, DELAY_MAX))
+            log(f"  Sample PII from purchase: User '{sample_purchase.get('user_full_name')}', Address '{sample_purchase.get('shipping_address')}'")
+    yield from pause(DELAY_MIN, DELAY_MAX)
 
     # 2. List users (receives PII)
-    print("Admin: Fetching first page of users (contains PII)...")
+    log("Admin: Fetching first page of users (contains PII)...")
     # Solicita a primeira página, com o limite padrão de 50 (ou o que o servidor impuser)
-    resp_users = req("GET", "/admin/users?page=1&per_page=50", is_admin_req=True) 
+    resp_users = yield from req("GET", "/admin/users?page=1&per_page=50", is_admin_req=True)
     if resp_users and resp_users.status_code == 200:
         response_data = resp_users.json()
         users_on_page = response_data.get("users", [])
         total_users = response_data.get("total_users", 0)
         current_page = response_data.get("page", 1)
         total_pages = response_data.get("total_pages", 1)
-        print(f"Admin: Fetched {len(users_on_page)} users on page {current_page}/{total_pages}. Total users: {total_users}.")
+        log(f"Admin: Fetched {len(users_on_page)} users on page {current_page}/{total_pages}. Total users: {total_users}.")
         if users_on_page:
             first_user = users_on_page[0] # Pega o primeiro usuário da página atual para exemplo
-            print(f"  Sample PII from first user: Username='{first_user.get('username')}', Email='{first_user.get('email')}', Full Name='{first_user.get('full_name')}'")
-    time.sleep(random.uniform(DELAY_MIN, DELAY_MAX))
+            log(f"  Sample PII from first user: Username='{first_user.get('username')}', Email='{first_user.get('email')}', Full Name='{first_user.get('full_name')}'")
+    yield from pause(DELAY_MIN, DELAY_MAX)
 
     # 3. Add a new item OR Restock an existing item
     if random.random() < 0.7: # 70% chance to add a new item
-        print("Admin: Adding a new item...")
+        log("Admin: Adding a new item...")
         new_item_payload = {
             "name": f"Awesome Gadget {random.randint(100,999)}",
-            "description": fake.sentence(nb_words=6),
+            "description": payloads.description(),
             "price": round(random.uniform(10, 500), 2),
             "stock": random.randint(20, 150) # Start with a decent stock
         }
-        resp_add = req("POST", "/admin/item", data=new_item_payload, is_admin_req=True)
+        resp_add = yield from req("POST", "/admin/item", data=new_item_payload, is_admin_req=True)
         if resp_add and resp_add.status_code == 201:
             # Optionally, refresh the global item list if a new item is added
-            fetch_items_for_gen()
+            yield from fetch_items_for_gen()
     elif available_item_ids_global: # Else, 30% chance to restock (if items exist)
         num_items_to_restock = random.randint(1, min(3, len(available_item_ids_global)))
-        print(f"Admin: Attempting to restock {num_items_to_restock} item(s)...")
+        log(f"Admin: Attempting to restock {num_items_to_restock} item(s)...")
         items_to_consider_restock = random.sample(available_item_ids_global, min(len(available_item_ids_global), 5)) # Consider a sample
-        
-        for item_id_to_restock in items_to_consider_restock[:num_items_to_restock]:
-            # Simple logic: restock to a random higher value
-            new_stock_value = random.randint(50, 250) 
-            print(f"Admin: Restocking item {item_id_to_restock} to {new_stock_value} units.")
-            restock_payload = {"stock": new_stock_value}
-            req("PUT", f"/admin/item/{item_id_to_restock}/stock", data=restock_payload, is_admin_req=True)
-            time.sleep(random.uniform(DELAY_MIN / 4, DELAY_MAX / 4))
+
+        # Simple logic: restock to a random higher value, all items in one bulk request
+        restock_rows = [{"item_id": item_id_to_restock, "stock": random.randint(50, 250)}
+                        for item_id_to_restock in items_to_consider_restock[:num_items_to_restock]]
+        resp_restock = yield from req("POST", "/admin/items", data=restock_rows, is_admin_req=True)
+        if resp_restock and resp_restock.status_code == 200:
+            log(f"Admin: Restocked {resp_restock.json().get('updated', 0)} item(s).")
     else:
-        print("Admin: No items to restock or chose not to add new item.")
+        log("Admin: No items to restock or chose not to add new item.")
 
     # Could also fetch items again to update available_item_ids_global
-    print("Admin actions finished.")
-
-
-def main():
-    print("Starting traffic generator...")
-    print(f"Target API: {API_BASE_URL}, Users: {NUM_USERS}, Delay: {DELAY_MIN}-{DELAY_MAX}s")
-    if not RUN_INDEFINITELY:
-        print(f"Will run for a limited number of cycles based on NUM_USERS.")
+    log("Admin actions finished.")
+
+
+def next_simulation():
+    if random.random() < 0.2 and admin_token_global: # 20% chance for admin action
+        return admin_actions_simulation()
+    user_id = f"simuser_{worker_tag}_{int(time.time()*1000)}"
+    return user_simulation(user_id)
+
+# --- Replay ---
+# Cada sessão gravada vira um cenário que consome uma fila própria; o leitor lê o arquivo em streaming,
+# só até ~1s à frente do relógio, e distribui as linhas pelas filas. Tokens de login e IDs criados pelas
+# sessões são trocados pelos desta execução. Uma requisição que depende de um login ou de um ID que outra
+# sessão ainda não obteve espera por ele (até REPLAY_WAIT_TIMEOUT) em vez de sair sem token ou com o ID antigo.
+replay_tokens = {} # username gravado -> token obtido no replay (None se o login falhou no replay)
+replay_ids = {} # ID gravado -> ID criado no replay
+replay_expected_users = set() # usuários com login bem-sucedido na gravação
+replay_expected_ids = set() # IDs capturados na gravação
+replay_lost_ids = set() # IDs gravados cuja requisição de origem falhou ou foi descartada no replay
+REPLAY_READ_AHEAD = 1.0
+
+class ReplaySession:
+    __slots__ = ('records', 'ended')
+
+    def __init__(self):
+        self.records = deque() # (instante pretendido em perf_counter ou None, registro)
+        self.ended = False
+
+def replay_waiting(user, needed):
+    # Login ou IDs que ainda podem chegar de outra sessão (os que falharam no replay não chegam mais)
+    return (user in replay_expected_users and user not in replay_tokens) or bool(needed - replay_ids.keys() - replay_lost_ids)
+
+def replay_scenario(replay):
+    while True:
+        if not replay.records:
+            if replay.ended: return
+            yield Pause(0.005)
+            continue
+        intended, record = replay.records.popleft()
+        if intended is not None:
+            delay = intended - time.perf_counter()
+            if delay > 0: yield Pause(delay)
+        user = record.get("user")
+        needed = collect_ids([record["path"], record.get("body")]) & replay_expected_ids
+        deadline = time.perf_counter() + REPLAY_WAIT_TIMEOUT
+        while replay_waiting(user, needed) and time.perf_counter() < deadline:
+            yield Pause(0.005)
+        if (user in replay_expected_users and not replay_tokens.get(user)) or not needed <= replay_ids.keys():
+            log(f"Replay: skipping {record['method']} {record['path']} (login or IDs it depends on are missing)")
+            stats.record_skipped_request()
+            replay_lost_ids.update(record.get("captures", {}).values())
+            continue
+        method = record["method"]
+        path = remap_ids(record["path"], replay_ids)
+        body = remap_ids(record.get("body"), replay_ids)
+        headers = {"Content-Type": "application/json", "User-Agent": random.choice(COMMON_USER_AGENTS)}
+        token = replay_tokens.get(user)
+        if token: headers['Authorization'] = f'Bearer {token}'
+        response = yield Call(method, f"{API_BASE_URL}{path}", body, headers, endpoint_template(method, path),
+                              user, intended)
+        data = response_data(response)
+        is_login = path == "/user/login" and isinstance(body, dict)
+        if data is None or response.status_code >= 400:
+            # Quem espera por este login ou por estes IDs desiste na hora em vez de esgotar o timeout
+            if is_login: replay_tokens.setdefault(body.get("username"), None)
+            replay_lost_ids.update(record.get("captures", {}).values())
+            continue
+        if is_login and data.get("access_token"):
+            replay_tokens[body.get("username")] = data["access_token"]
+        new_ids = extract_ids(data)
+        for key, old_id in record.get("captures", {}).items():
+            if key in new_ids: replay_ids[old_id] = new_ids[key]
+            else: replay_lost_ids.add(old_id)
+
+def replay_events(path, speed):
+    # Gera ("wait", segundos) para o motor dormir e ("start", ReplaySession) para abrir uma sessão
+    sessions = {}
+    started = time.perf_counter()
+    try:
+        for record in iter_records(path):
+            replay = sessions.get(record["session"])
+            if record.get("end"):
+                if replay:
+                    replay.ended = True
+                    del sessions[record["session"]]
+                continue
+            body = record.get("body")
+            if record["path"] == "/user/login" and record.get("status") == 200 and isinstance(body, dict) and body.get("username"):
+                replay_expected_users.add(body["username"])
+            replay_expected_ids.update(record.get("captures", {}).values())
+            intended = None
+            if speed > 0:
+                intended = started + record["t"] / speed
+                ahead = intended - time.perf_counter() - REPLAY_READ_AHEAD
+                if ahead > 0: yield ("wait", ahead)
+            if replay is None:
+                replay = sessions[record["session"]] = ReplaySession()
+                yield ("start", replay)
+            replay.records.append((intended, record))
+    finally:
+        for replay in sessions.values(): replay.ended = True
 
-    initial_setup() # Login admin, fetch initial items
+def main_threads_replay(path):
+    threads = []
+    try:
+        for kind, value in replay_events(path, REPLAY_SPEED):
+            if kind == "wait":
+                time.sleep(value)
+                continue
+            thread = threading.Thread(target=run_scenario_sync, args=(replay_scenario(value),))
+            threads.append(thread)
+            thread.start()
+    except KeyboardInterrupt:
+        print("\nStopping replay...")
+    finally:
+        print("Waiting for replayed sessions to complete...")
+        for t in threads:
+            t.join(timeout=15)
+        print("Replay finished.")
+
+async def main_async_replay(path):
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10)) as session:
+        tasks = set()
+        try:
+            for kind, value in replay_events(path, REPLAY_SPEED):
+                if kind == "wait":
+                    await asyncio.sleep(value)
+                    continue
+                task = asyncio.create_task(run_scenario_async(replay_scenario(value), session))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await asyncio.sleep(0) # deixa as sessões andarem enquanto o arquivo é lido
+        finally:
+            print("Waiting for replayed sessions to complete...")
+            if tasks:
+                await asyncio.wait(tasks, timeout=15)
+            for task in tasks: task.cancel()
+            print("Replay finished.")
+
+def main_threads(num_users):
+    run_scenario_sync(initial_setup()) # Login admin, fetch initial items
 
     threads = []
     run_count = 0
-    max_runs = NUM_USERS * 2 # Arbitrary number of runs if not indefinite
+    max_runs = num_users * 2 # Arbitrary number of runs if not indefinite
 
     try:
         while RUN_INDEFINITELY or run_count < max_runs:
             # Clean up finished threads
             threads = [t for t in threads if t.is_alive()]
 
-            if len(threads) < NUM_USERS:
-                if random.random() < 0.2 and admin_token_global: # 20% chance for admin action
-                    thread = threading.Thread(target=admin_actions_simulation)
-                else:
-                    user_id = f"simuser_{int(time.time()*1000)}"
-                    thread = threading.Thread(target=user_simulation, args=(user_id,))
-                
+            if len(threads) < num_users:
+                thread = threading.Thread(target=run_scenario_sync, args=(next_simulation(),))
                 threads.append(thread)
                 thread.start()
                 run_count +=1
@@ -277,17 +649,265 @@ def main():
             t.join(timeout=15)
         print("Traffic generation finished.")
 
+async def main_async(num_users):
+    # Um único event loop e um pool de conexões keep-alive compartilhado por todas as sessões simuladas
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10)) as session:
+        await run_scenario_async(initial_setup(), session) # Login admin, fetch initial items
+
+        tasks = set()
+        run_count = 0
+        max_runs = num_users * 2 # Arbitrary number of runs if not indefinite
+        try:
+            while RUN_INDEFINITELY or run_count < max_runs:
+                # Mantém num_users sessões ativas, como o modo de threads
+                while len(tasks) < num_users and (RUN_INDEFINITELY or run_count < max_runs):
+                    tasks.add(asyncio.create_task(run_scenario_async(next_simulation(), session)))
+                    run_count += 1
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception(): print(f"Simulation failed: {task.exception()!r}")
+        finally:
+            print("Waiting for active sessions to complete...")
+            if tasks:
+                await asyncio.wait(tasks, timeout=15)
+            for task in tasks: task.cancel()
+            print("Traffic generation finished.")
+
+def main_threads_open(profile):
+    run_scenario_sync(initial_setup()) # Login admin, fetch initial items
+
+    threads = []
+    started = time.perf_counter()
+    try:
+        for offset in profile.arrivals():
+            intended = started + offset
+            delay = intended - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            threads = [t for t in threads if t.is_alive()]
+            if len(threads) >= MAX_SESSIONS:
+                stats.record_dropped_session()
+                continue
+            thread = threading.Thread(target=run_scenario_sync, args=(next_simulation(), intended))
+            threads.append(thread)
+            thread.start()
+    except KeyboardInterrupt:
+        print("\nStopping traffic generator...")
+    finally:
+        print("Waiting for active threads to complete...")
+        for t in threads:
+            t.join(timeout=15)
+        print("Traffic generation finished.")
+
+async def main_async_open(profile):
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10)) as session:
+        await run_scenario_async(initial_setup(), session) # Login admin, fetch initial items
+
+        tasks = set()
+        started = time.perf_counter()
+        try:
+            # O agendador não espera as sessões terminarem: a próxima chegada depende só do perfil
+            for offset in profile.arrivals():
+                intended = started + offset
+                delay = intended - time.perf_counter()
+                if delay > 0: await asyncio.sleep(delay)
+                if len(tasks) >= MAX_SESSIONS:
+                    stats.record_dropped_session()
+                    continue
+                task = asyncio.create_task(run_scenario_async(next_simulation(), session, intended))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            print("Waiting for active sessions to complete...")
+            if tasks:
+                await asyncio.wait(tasks, timeout=15)
+            for task in tasks: task.cancel()
+            print("Traffic generation finished.")
+
+def run_engine(engine, num_users, profile=None, replay_path=None):
+    if engine == "async":
+        try:
+            if replay_path:
+                asyncio.run(main_async_replay(replay_path))
+            else:
+                asyncio.run(main_async_open(profile) if profile else main_async(num_users))
+        except KeyboardInterrupt:
+            print("\nStopping traffic generator...")
+    elif replay_path:
+        main_threads_replay(replay_path)
+    elif profile:
+        main_threads_open(profile)
+    else:
+        main_threads(num_users)
+
+def print_report(run_stats, elapsed, final=False):
+    report = run_stats.report(elapsed)
+    label = f"Totals after {elapsed:.1f}s:" if final else f"[{elapsed:7.1f}s]"
+    print(f"{label} {format_summary(report)}")
+    print(format_table(report))
+    return report
+
+def start_reporter(emit, stop_event):
+    # Chama emit() a cada REPORT_INTERVAL segundos numa thread daemon
+    def loop():
+        while not stop_event.wait(REPORT_INTERVAL):
+            emit()
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+def open_recorder(path):
+    global recorder
+    if path: recorder = RecordWriter(path, time.perf_counter())
+
+def close_recorder():
+    if recorder: recorder.close()
+
+def worker_process(index, engine, num_users, profile, max_rps, results_queue):
+    # Processo filho: roda sua fatia de usuários e envia as estatísticas (deltas) ao pai periodicamente
+    global pacer, worker_tag
+    random.seed()
+    fake.seed_instance(random.getrandbits(32))
+    worker_tag = str(index)
+    pacer = RatePacer(max_rps)
+    open_recorder(RECORD_FILE and f"{RECORD_FILE}.{index}") # um arquivo por processo
+    stop_event = threading.Event()
+    start_reporter(lambda: results_queue.put(("stats", index, stats.drain())), stop_event)
+    try:
+        run_engine(engine, num_users, profile)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        close_recorder()
+        results_queue.put(("done", index, stats.drain()))
+
+def main_processes(engine, profile):
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    results_queue = context.Queue()
+    totals = Stats()
+    if SEED_ITEMS:
+        # Semeia o catálogo uma vez, antes do fork: os filhos herdam catalog_seeded e só fazem login e
+        # buscam os itens. As requisições do seed entram no total aqui, e não na cópia de cada filho.
+        run_scenario_sync(initial_setup(fetch_items=False))
+        totals.merge(stats.drain())
+        thread_local.session.close() # a conexão keep-alive não pode ser herdada pelos filhos
+        del thread_local.session
+    workers = []
+    for index in range(NUM_PROCESSES):
+        num_users = NUM_USERS // NUM_PROCESSES + (1 if index < NUM_USERS % NUM_PROCESSES else 0)
+        if not num_users and not profile: continue
+        # No open-loop cada processo recebe a mesma fração da taxa de chegada
+        worker_profile = None
+        if profile:
+            worker_profile = ArrivalProfile(profile.kind, profile.base_rate, profile.peak_rate, profile.duration,
+                                            profile.steps, profile.spike_start, profile.spike_duration,
+                                            scale=1.0 / NUM_PROCESSES)
+        process = context.Process(target=worker_process,
+                                  args=(index, engine, num_users, worker_profile, MAX_RPS / NUM_PROCESSES, results_queue))
+        process.start()
+        workers.append(process)
+
+    started = time.monotonic()
+    next_report = started + REPORT_INTERVAL
+    pending = len(workers)
+    try:
+        while pending:
+            try:
+                kind, index, data = results_queue.get(timeout=max(next_report - time.monotonic(), 0.05))
+                totals.merge(data)
+                if kind == "done": pending -= 1
+            except queue.Empty:
+                if not any(process.is_alive() for process in workers): break
+            if time.monotonic() >= next_report:
+                print_report(totals, time.monotonic() - started)
+                next_report += REPORT_INTERVAL
+    except KeyboardInterrupt:
+        print("\nStopping workers...")
+        deadline = time.monotonic() + 20
+        while pending and time.monotonic() < deadline:
+            try:
+                kind, index, data = results_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            totals.merge(data)
+            if kind == "done": pending -= 1
+    for process in workers:
+        process.join(timeout=5)
+    return totals, time.monotonic() - started
+
+def main():
+    engine = ENGINE
+    if engine == "auto":
+        engine = "async" if aiohttp is not None else "thread"
+    elif engine == "async" and aiohttp is None:
+        print("GEN_ENGINE=async requires aiohttp (pip install aiohttp). Falling back to threads.")
+        engine = "thread"
+
+    profile = None
+    if MODE == "open":
+        try:
+            profile = ArrivalProfile(LOAD_PROFILE, ARRIVAL_RATE, PEAK_RATE, RUN_DURATION, PROFILE_STEPS,
+                                     SPIKE_START, SPIKE_DURATION)
+        except ValueError as e:
+            print(f"Invalid open-loop configuration: {e}")
+            return
+
+    global payloads
+    payloads = build_payloads(fake, PAYLOAD_POOL_SIZE, PAYLOAD_FILE or None)
+    print("Starting traffic generator...")
+    if REPLAY_FILE:
+        print(f"Target API: {API_BASE_URL}, Replaying: {REPLAY_FILE} at speed {REPLAY_SPEED:g} (0 = max), Engine: {engine}")
+        if NUM_PROCESSES > 1 or MODE == "open":
+            print("Replay runs in a single process and ignores GEN_PROCESSES and GEN_MODE.")
+    elif profile:
+        print(f"Target API: {API_BASE_URL}, Open-loop: {profile.describe()}, Delay: {DELAY_MIN}-{DELAY_MAX}s, Engine: {engine}, Processes: {NUM_PROCESSES}")
+        if RUN_DURATION > 0:
+            print(f"Will schedule arrivals for {RUN_DURATION:g}s.")
+    else:
+        print(f"Target API: {API_BASE_URL}, Users: {NUM_USERS}, Delay: {DELAY_MIN}-{DELAY_MAX}s, Engine: {engine}, Processes: {NUM_PROCESSES}")
+        if not RUN_INDEFINITELY:
+            print("Will run for a limited number of cycles based on NUM_USERS.")
+
+    if payloads:
+        print(f"Payload pool: {len(payloads)} pre-generated users/cards.")
+
+    if NUM_PROCESSES > 1 and not REPLAY_FILE:
+        totals, elapsed = main_processes(engine, profile)
+    else:
+        started = time.monotonic()
+        stop_event = threading.Event()
+        start_reporter(lambda: print_report(stats, time.monotonic() - started), stop_event)
+        open_recorder(RECORD_FILE)
+        try:
+            run_engine(engine, NUM_USERS, None if REPLAY_FILE else profile, REPLAY_FILE or None)
+        finally:
+            stop_event.set()
+            close_recorder()
+        totals, elapsed = stats, time.monotonic() - started
+    report = print_report(totals, elapsed, final=True)
+    if REPORT_FILE:
+        write_report(REPORT_FILE, report, {"api_base_url": API_BASE_URL, "engine": engine, "processes": NUM_PROCESSES,
+                                           "mode": "replay" if REPLAY_FILE else MODE,
+                                           "load": REPLAY_FILE or (profile.describe() if profile else f"{NUM_USERS} users"),
+                                           "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        print(f"Report written to {REPORT_FILE}")
+
 def fetch_items_for_gen(): # Helper function to refresh item list
-    global available_item_ids_global
-    print("Generator: Fetching item list...")
-    resp_items = req("GET", "/items")
-    if resp_items and resp_items.status_code == 200:
+    global available_item_ids_global, items_etag_global
+    log("Generator: Fetching item list...")
+    resp_items = yield from req("GET", "/items", extra_headers={"If-None-Match": items_etag_global} if items_etag_global else None)
+    if resp_items and resp_items.status_code == 304:
+        log("Generator: Item list unchanged.")
+    elif resp_items and resp_items.status_code == 200:
+        items_etag_global = resp_items.headers.get("ETag")
         items_data = resp_items.json()
         new_item_ids = [item['item_id'] for item in items_data if isinstance(item, dict) and 'item_id' in item]
         # Only update if there's a change to avoid too much printing if list is stable
         if set(new_item_ids) != set(available_item_ids_global):
             available_item_ids_global = new_item_ids
-            print(f"Generator: Updated available items list. Count: {len(available_item_ids_global)}")
+            log(f"Generator: Updated available items list. Count: {len(available_item_ids_global)}")
     else:
         print("Generator: Failed to fetch/update items list.")
 
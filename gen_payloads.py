@@ -0,0 +1,169 @@
+import os
+import json
+import random
+import re
+import threading
+
+# --- Payloads do gerador de tráfego ---
+# Gerar dados com o Faker a cada sessão custa mais CPU do que enviar as requisições. O PayloadPool gera
+# (ou carrega do disco) um lote de cadastros, cartões e descrições uma única vez; as sessões sorteiam dele.
+# Arquivo do pool: JSONL com uma linha por payload, {"kind": "user" | "card" | "description", "payload": ...}.
+
+
+def fake_user(fake):
+    return {"password": fake.password(), "email": fake.email(), "full_name": fake.name(),
+            "address": fake.address().replace("\n", ", ")}
+
+
+def fake_card(fake):
+    expiry_month, expiry_year = fake.credit_card_expire().split("/")
+    return {"card_number": fake.credit_card_number(), "expiry_month": expiry_month,
+            "expiry_year": "20" + expiry_year, "cvv": fake.credit_card_security_code()}
+
+
+def fake_description(fake):
+    return fake.sentence(nb_words=6)
+
+
+class PayloadPool:
+    KINDS = ("user", "card", "description")
+
+    def __init__(self, users, cards, descriptions):
+        if not users or not cards or not descriptions:
+            raise ValueError("Payload pool needs at least one user, card and description")
+        self.users, self.cards, self.descriptions = users, cards, descriptions
+
+    @classmethod
+    def generate(cls, fake, size):
+        return cls([fake_user(fake) for _ in range(size)], [fake_card(fake) for _ in range(size)],
+                   [fake_description(fake) for _ in range(max(size // 10, 1))])
+
+    @classmethod
+    def load(cls, path):
+        payloads = {kind: [] for kind in cls.KINDS}
+        with open(path) as f:
+            for line in f:
+                if not line.strip(): continue
+                record = json.loads(line)
+                payloads[record["kind"]].append(record["payload"])
+        return cls(payloads["user"], payloads["card"], payloads["description"])
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            for kind, payloads in zip(self.KINDS, (self.users, self.cards, self.descriptions)):
+                for payload in payloads:
+                    f.write(json.dumps({"kind": kind, "payload": payload}) + "\n")
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.users)
+
+    def user(self):
+        return self.users[random.randrange(len(self.users))]
+
+    def card(self):
+        return self.cards[random.randrange(len(self.cards))]
+
+    def description(self):
+        return self.descriptions[random.randrange(len(self.descriptions))]
+
+
+class InlinePayloads:
+    # Mesma interface do PayloadPool, gerando com o Faker a cada chamada (GEN_PAYLOAD_POOL_SIZE=0)
+    def __init__(self, fake):
+        self.fake = fake
+
+    def __len__(self):
+        return 0
+
+    def user(self):
+        return fake_user(self.fake)
+
+    def card(self):
+        return fake_card(self.fake)
+
+    def description(self):
+        return fake_description(self.fake)
+
+
+def build_payloads(fake, size, path=None):
+    # Carrega do arquivo se existir; senão gera `size` payloads (e salva no arquivo, se informado)
+    if path and os.path.exists(path):
+        return PayloadPool.load(path)
+    if size <= 0:
+        return InlinePayloads(fake)
+    pool = PayloadPool.generate(fake, size)
+    if path: pool.save(path)
+    return pool
+
+
+# --- Gravação e replay de sessões ---
+# Formato (JSONL, uma requisição por linha; a linha "end" fecha a sessão):
+#   {"t": 1.234, "session": "0-17", "method": "POST", "path": "/cart/item", "body": {...},
+#    "user": "simuser_0_...", "captures": {"order_id": "..."}}
+#   {"session": "0-17", "end": true}
+# "t" é o instante de envio em segundos desde o início da gravação; "user" é o dono do token usado;
+# "captures" guarda os IDs devolvidos na resposta, para o replay trocar os IDs gravados pelos novos.
+# IDs que a própria sessão não criou (itens do catálogo inicial, por exemplo) são enviados como gravados,
+# então o replay espera um servidor com o mesmo estado de partida (mesmo SQLITE_PATH ou itens recriados).
+
+CAPTURE_KEYS = ("order_id", "review_id", "item_id")
+
+
+def extract_ids(data):
+    if not isinstance(data, dict): return {}
+    ids = {key: data[key] for key in CAPTURE_KEYS if isinstance(data.get(key), str)}
+    if isinstance(data.get("item"), dict) and isinstance(data["item"].get("item_id"), str):
+        ids["item_id"] = data["item"]["item_id"]
+    return ids
+
+
+UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+
+
+def remap_ids(value, id_map):
+    # Troca IDs (UUIDs) gravados pelos equivalentes desta execução em strings, listas e dicts
+    if not id_map or value is None: return value
+    if isinstance(value, str):
+        return UUID_PATTERN.sub(lambda match: id_map.get(match.group(0), match.group(0)), value)
+    if isinstance(value, list): return [remap_ids(item, id_map) for item in value]
+    if isinstance(value, dict): return {key: remap_ids(item, id_map) for key, item in value.items()}
+    return value
+
+
+def collect_ids(value, found=None):
+    # IDs (UUIDs) presentes em strings, listas e dicts
+    if found is None: found = set()
+    if isinstance(value, str): found.update(UUID_PATTERN.findall(value))
+    elif isinstance(value, list):
+        for item in value: collect_ids(item, found)
+    elif isinstance(value, dict):
+        for item in value.values(): collect_ids(item, found)
+    return found
+
+
+def iter_records(path):
+    # Lê o arquivo em streaming: memória proporcional às sessões ativas, não ao tamanho do arquivo
+    with open(path) as f:
+        for line in f:
+            if line.strip(): yield json.loads(line)
+
+
+class RecordWriter:
+    # As linhas são escritas quando a resposta chega, então sessões diferentes podem ficar fora de ordem
+    # por até uma latência; dentro de uma sessão a ordem é sempre a de envio.
+    def __init__(self, path, start):
+        self._file = open(path, "a", buffering=1 << 16)
+        self._start = start
+        self._lock = threading.Lock()
+
+    def write(self, record, sent_at=None):
+        if sent_at is not None: record["t"] = round(sent_at - self._start, 6)
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,212 @@
+import csv
+import json
+import threading
+
+# --- Estatísticas do gerador de tráfego ---
+# Histograma de latência no estilo HDR: valores em microssegundos, exatos abaixo de 128us e, acima disso,
+# 64 sub-buckets por potência de 2 (erro relativo < 1.6%). Os buckets ficam num dict esparso, então
+# snapshots são pequenos, serializáveis em JSON e podem ser somados entre processos.
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+
+def bucket_index(micros):
+    if micros < SUB_BUCKET_COUNT: return micros
+    shift = micros.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + ((micros >> shift) - SUB_BUCKET_HALF)
+
+
+def bucket_value(index):
+    # Limite superior do bucket (o percentil nunca é subestimado)
+    if index < SUB_BUCKET_COUNT: return index
+    shift, offset = divmod(index - SUB_BUCKET_COUNT, SUB_BUCKET_HALF)
+    shift += 1
+    return ((offset + SUB_BUCKET_HALF + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self, counts=None, max_micros=0):
+        self.counts = dict(counts or {})
+        self.total = sum(self.counts.values())
+        self.max = max_micros
+
+    def record(self, seconds):
+        micros = max(int(seconds * 1_000_000), 0)
+        index = bucket_index(micros)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        if micros > self.max: self.max = micros
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct):
+        # Em segundos
+        if not self.total: return 0.0
+        threshold = self.total * pct / 100.0
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                return min(bucket_value(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    def to_dict(self):
+        return {"counts": {str(index): count for index, count in self.counts.items()}, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({int(index): count for index, count in data["counts"].items()}, data["max"])
+
+
+class RequestStats:
+    # Contadores de um conjunto de requisições (um endpoint ou o total)
+    __slots__ = ('requests', 'transport_errors', 'status_counts', 'latency')
+
+    def __init__(self):
+        self.requests = 0
+        self.transport_errors = 0
+        self.status_counts = {}
+        self.latency = LatencyHistogram()
+
+    def record(self, status, seconds):
+        self.requests += 1
+        if status is None:
+            self.transport_errors += 1
+        else:
+            key = str(status)
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        self.latency.record(seconds)
+
+    def to_dict(self):
+        return {"requests": self.requests, "transport_errors": self.transport_errors,
+                "status_counts": dict(self.status_counts), "latency": self.latency.to_dict()}
+
+    def merge(self, data):
+        self.requests += data["requests"]
+        self.transport_errors += data["transport_errors"]
+        for status, count in data["status_counts"].items():
+            self.status_counts[status] = self.status_counts.get(status, 0) + count
+        self.latency.merge(LatencyHistogram.from_dict(data["latency"]))
+
+    def report(self, elapsed):
+        # Resumo numérico (latências em ms) usado na impressão e nos relatórios JSON/CSV
+        latency = self.latency
+        return {
+            "requests": self.requests,
+            "throughput_rps": round(self.requests / elapsed, 2) if elapsed > 0 else 0.0,
+            "transport_errors": self.transport_errors,
+            "server_errors": sum(count for status, count in self.status_counts.items() if status >= "500"),
+            "client_errors": sum(count for status, count in self.status_counts.items() if "400" <= status < "500"),
+            "status_counts": dict(sorted(self.status_counts.items())),
+            "p50_ms": round(latency.percentile(50) * 1000, 3),
+            "p90_ms": round(latency.percentile(90) * 1000, 3),
+            "p99_ms": round(latency.percentile(99) * 1000, 3),
+            "max_ms": round(latency.max / 1000, 3),
+        }
+
+
+class Stats:
+    # Estatísticas de uma execução: total e por endpoint (template, ex. "POST /order/{id}/pay/card").
+    # Thread-safe; `drain()` devolve e zera o acumulado desde a última chamada, que é o que os
+    # processos filhos enviam periodicamente ao processo pai.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.total = RequestStats()
+        self.endpoints = {}
+        self.dropped_sessions = 0 # modo open-loop: chegadas descartadas por excesso de sessões ativas
+        self.skipped_requests = 0 # replay: requisições descartadas por falta do login ou dos IDs de que dependem
+
+    def record_dropped_session(self):
+        with self._lock:
+            self.dropped_sessions += 1
+
+    def record_skipped_request(self):
+        with self._lock:
+            self.skipped_requests += 1
+
+    def record(self, endpoint, status, seconds):
+        # status None = erro de conexão/timeout
+        with self._lock:
+            self.total.record(status, seconds)
+            endpoint_stats = self.endpoints.get(endpoint)
+            if endpoint_stats is None:
+                endpoint_stats = self.endpoints[endpoint] = RequestStats()
+            endpoint_stats.record(status, seconds)
+
+    def _to_dict(self):
+        return {"total": self.total.to_dict(), "dropped_sessions": self.dropped_sessions,
+                "skipped_requests": self.skipped_requests,
+                "endpoints": {endpoint: stats.to_dict() for endpoint, stats in self.endpoints.items()}}
+
+    def drain(self):
+        with self._lock:
+            data = self._to_dict()
+            self._reset()
+            return data
+
+    def merge(self, data):
+        with self._lock:
+            self.total.merge(data["total"])
+            self.dropped_sessions += data["dropped_sessions"]
+            self.skipped_requests += data["skipped_requests"]
+            for endpoint, endpoint_data in data["endpoints"].items():
+                endpoint_stats = self.endpoints.get(endpoint)
+                if endpoint_stats is None:
+                    endpoint_stats = self.endpoints[endpoint] = RequestStats()
+                endpoint_stats.merge(endpoint_data)
+
+    def report(self, elapsed):
+        with self._lock:
+            return {"elapsed_s": round(elapsed, 3), "total": self.total.report(elapsed),
+                    "dropped_sessions": self.dropped_sessions, "skipped_requests": self.skipped_requests,
+                    "endpoints": {endpoint: self.endpoints[endpoint].report(elapsed)
+                                  for endpoint in sorted(self.endpoints)}}
+
+
+def format_summary(report):
+    total = report["total"]
+    return (f"{total['requests']} reqs ({total['throughput_rps']:.1f} req/s) | errors: "
+            f"{total['transport_errors']} conn, {total['server_errors']} 5xx, {total['client_errors']} 4xx | "
+            f"p50 {total['p50_ms']:.1f}ms p90 {total['p90_ms']:.1f}ms p99 {total['p99_ms']:.1f}ms "
+            f"max {total['max_ms']:.1f}ms" +
+            (f" | dropped sessions: {report['dropped_sessions']}" if report["dropped_sessions"] else "") +
+            (f" | skipped replay requests: {report['skipped_requests']}" if report["skipped_requests"] else ""))
+
+
+def format_table(report):
+    header = f"  {'endpoint':<40} {'reqs':>8} {'req/s':>8} {'p50ms':>8} {'p90ms':>8} {'p99ms':>8} {'maxms':>8}  status"
+    lines = [header]
+    for endpoint, row in report["endpoints"].items():
+        statuses = " ".join(f"{status}:{count}" for status, count in row["status_counts"].items())
+        if row["transport_errors"]: statuses += f" conn_err:{row['transport_errors']}"
+        lines.append(f"  {endpoint:<40} {row['requests']:>8} {row['throughput_rps']:>8.1f} {row['p50_ms']:>8.1f} "
+                     f"{row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}  {statuses}")
+    return "\n".join(lines)
+
+
+CSV_FIELDS = ("endpoint", "requests", "throughput_rps", "transport_errors", "server_errors", "client_errors",
+              "p50_ms", "p90_ms", "p99_ms", "max_ms", "status_counts")
+
+
+def write_report(path, report, metadata):
+    # .csv: uma linha por endpoint (e uma linha TOTAL); qualquer outra extensão: JSON com metadados da execução
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            rows = [("TOTAL", report["total"])] + list(report["endpoints"].items())
+            for endpoint, row in rows:
+                statuses = ";".join(f"{status}:{count}" for status, count in row["status_counts"].items())
+                writer.writerow([endpoint] + [row[field] for field in CSV_FIELDS[1:-1]] + [statuses])
+    else:
+        with open(path, "w") as f:
+            json.dump({**metadata, **report}, f, indent=2)
@@ -0,0 +1,38 @@
+import os
+import multiprocessing
+
+# --- Configuração do gunicorn (produção) ---
+# Uso: gunicorn -c gunicorn.conf.py wsgi:app
+# Workers gthread: cada worker é um processo com WEB_THREADS threads. O store em memória não é
+# compartilhado entre processos, então o padrão é 1 worker com memory e 2*CPUs+1 com sqlite.
+
+_memory_store = os.environ.get('STORAGE_BACKEND', 'memory') == 'memory'
+
+bind = f"{os.environ.get('WEB_HOST', '0.0.0.0')}:{os.environ.get('FLASK_RUN_PORT', '5000')}"
+workers = int(os.environ.get('WEB_WORKERS', 0)) or (1 if _memory_store else multiprocessing.cpu_count() * 2 + 1)
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+worker_connections = int(os.environ.get('WEB_CONNECTION_LIMIT', 1000))
+backlog = int(os.environ.get('WEB_BACKLOG', 2048))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5)) # segundos esperando a próxima requisição na mesma conexão
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)) # SIGTERM: prazo para terminar as requisições
+# Reciclar workers limita vazamentos de memória; desligado por padrão porque perderia os dados do store em memória
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+# O app não é carregado no master: cada worker cria o próprio pool de hashing e as próprias conexões SQLite
+preload_app = False
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None # o /metrics já cobre latência e status por endpoint
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    if _memory_store and workers > 1:
+        server.log.warning("STORAGE_BACKEND=memory with %d workers: each worker keeps its own data. "
+                           "Use STORAGE_BACKEND=sqlite for multiple workers.", workers)
+
+
+def worker_exit(server, worker):
+    from server import shutdown_app
+    shutdown_app()
@@ -0,0 +1,63 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # opcional; sem orjson usamos o json da stdlib
+    orjson = None
+
+# --- Serialização JSON ---
+# Providers usados por app.json (jsonify, request.get_json, catálogo e streams de pedidos).
+# Em modo compacto (produção) a saída não tem espaços nem indentação; fora dele, indenta como o Flask
+# faz em debug. sort_keys fica desligado por padrão: ordenar chaves custa caro e nenhum cliente depende disso.
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    # json da stdlib, mas compacto também em dumps() (o DefaultJSONProvider só compacta em response())
+    sort_keys = False
+
+    def _is_compact(self):
+        return not ((self.compact is None and self._app.debug) or self.compact is False)
+
+    def dumps(self, obj, **kwargs):
+        if self._is_compact(): kwargs.setdefault("separators", (",", ":"))
+        else: kwargs.setdefault("indent", 2)
+        return super().dumps(obj, **kwargs)
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+class OrjsonProvider(CompactJSONProvider):
+    # orjson gera bytes UTF-8 direto (sem passar por str); tipos que ele não conhece (Decimal, date
+    # do http_date etc.) caem no default do Flask
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys: options |= orjson.OPT_SORT_KEYS
+        if not self._is_compact(): options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if kwargs: return super().dumps(obj, **kwargs) # opções específicas do json da stdlib
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def loads(self, s, **kwargs):
+        if kwargs: return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def configure_json(app, backend='auto', compact=None, sort_keys=False):
+    # backend: 'orjson', 'stdlib' ou 'auto' (orjson se estiver instalado). compact=None segue o modo debug.
+    if backend == 'orjson' and orjson is None:
+        app.logger.warning("JSON_BACKEND=orjson but orjson is not installed; using the stdlib encoder.")
+    provider_class = OrjsonProvider if backend in ('auto', 'orjson') and orjson is not None else CompactJSONProvider
+    app.json = provider_class(app)
+    app.json.compact = compact
+    app.json.sort_keys = sort_keys
+    return app.json
@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import mmap
+import time
+import queue
+import atexit
+import random
+import struct
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+
+# --- Logging assíncrono ---
+# As threads de request só enfileiram o LogRecord (sem I/O e sem montar a mensagem); um QueueListener
+# em segundo plano formata cada registro como uma linha JSON e grava no destino: stderr, arquivo
+# rotativo ou ring buffer mapeado em memória. Amostragem e limite de taxa por logger descartam
+# registros antes da fila; WARNING ou acima nunca são descartados por eles.
+# Uso nos endpoints: app.logger.info("Order %s for %s.", order_id, username, extra={"order_id": order_id})
+
+# Atributos padrão do LogRecord; o que sobrar veio de extra={...} e vira campo do JSON
+STANDARD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+def parse_log_rules(text):
+    # "werkzeug=0.1,app=200" -> {"werkzeug": 0.1, "app": 200.0}
+    rules = {}
+    for part in text.split(','):
+        if part.strip():
+            name, _, value = part.partition('=')
+            rules[name.strip()] = float(value)
+    return rules
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+                 "level": record.levelname, "logger": record.name, "msg": record.getMessage()}
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS: entry[key] = value
+        if record.exc_info: entry["exc"] = self.formatException(record.exc_info)
+        if record.stack_info: entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # O QueueHandler padrão formata a mensagem aqui, na thread do request. Mantemos msg e args
+        # como vieram: a formatação fica para o listener (args devem ser valores que não mudam depois).
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full: # listener atrasado: descarta em vez de bloquear o request
+            with self.lock: self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    # sample: {logger: fração mantida}; limits: {logger: registros/s, rajada de até 1s}.
+    # A regra de um logger vale para os filhos ('werkzeug' cobre 'werkzeug.x'); '' vale para todos.
+    def __init__(self, sample=None, limits=None):
+        super().__init__()
+        self.sample = sample or {}
+        self.limits = limits or {}
+        self.suppressed = 0
+        self._buckets = {} # logger da regra -> [tokens, instante da última leitura]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _rule(rules, name):
+        while name not in rules:
+            if not name: return None, None
+            name = name.rpartition('.')[0]
+        return name, rules[name]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING: return True
+        _, fraction = self._rule(self.sample, record.name)
+        if fraction is not None and random.random() >= fraction:
+            with self._lock: self.suppressed += 1
+            return False
+        key, rate = self._rule(self.limits, record.name)
+        if rate is None: return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(key, [rate, now])
+            tokens = min(rate, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                self.suppressed += 1
+                return False
+            bucket[0] = tokens - 1
+            return True
+
+
+class RingBufferHandler(logging.Handler):
+    # Arquivo de tamanho fixo mapeado em memória: os registros novos sobrescrevem os mais antigos e
+    # cada escrita é só uma cópia para a página mapeada (o kernel grava no disco depois).
+    # Cabeçalho de 8 bytes = total de bytes já escritos; a posição de escrita é total % capacidade.
+    HEADER = struct.Struct('<Q')
+
+    def __init__(self, path, size):
+        super().__init__()
+        self.capacity = size
+        length = self.HEADER.size + size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            resized = os.fstat(fd).st_size != length
+            if resized: os.ftruncate(fd, length)
+            self._map = mmap.mmap(fd, length)
+        finally:
+            os.close(fd)
+        # Arquivo existente do mesmo tamanho: continua de onde parou
+        self._total = 0 if resized else self.HEADER.unpack_from(self._map, 0)[0]
+
+    def emit(self, record):
+        try:
+            data = (self.format(record) + "\n").encode('utf-8')[-self.capacity:]
+            start = self._total % self.capacity
+            first = min(len(data), self.capacity - start)
+            offset = self.HEADER.size
+            self._map[offset + start:offset + start + first] = data[:first]
+            self._map[offset:offset + len(data) - first] = data[first:] # o resto dá a volta no buffer
+            self._total += len(data)
+            self.HEADER.pack_into(self._map, 0, self._total)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        with self.lock:
+            if self._map is not None:
+                self._map.flush()
+                self._map.close()
+                self._map = None
+        super().close()
+
+
+def read_ring(path):
+    # Linhas do ring buffer, da mais antiga para a mais recente
+    with open(path, 'rb') as f: raw = f.read()
+    total = RingBufferHandler.HEADER.unpack_from(raw, 0)[0]
+    data = raw[RingBufferHandler.HEADER.size:]
+    if total <= len(data):
+        content = data[:total]
+    else:
+        pos = total % len(data)
+        # A linha mais antiga pode ter sido sobrescrita pela metade: descarta até o primeiro "\n"
+        content = (data[pos:] + data[:pos]).partition(b"\n")[2]
+    return content.decode('utf-8', 'replace').splitlines()
+
+
+class LogPipeline:
+    def __init__(self, handler, queue_size=10000, sample=None, limits=None):
+        self.handler = handler
+        self.queue_handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+        self.filter = SamplingFilter(sample, limits)
+        self.queue_handler.addFilter(self.filter)
+        self.listener = logging.handlers.QueueListener(self.queue_handler.queue, handler, respect_handler_level=True)
+        self._running = False
+
+    def start(self):
+        self.listener.start()
+        self._running = True
+        atexit.register(self.stop) # sem isso, o que estiver na fila se perde ao sair
+
+    def stop(self):
+        # Esvazia a fila antes de fechar o destino; pode ser chamado mais de uma vez
+        if not self._running: return
+        self._running = False
+        if self.filter.suppressed or self.queue_handler.dropped:
+            logging.getLogger(__name__).warning(
+                "Log pipeline: %d records sampled out or rate limited, %d dropped (queue full).",
+                self.filter.suppressed, self.queue_handler.dropped)
+        self.listener.stop()
+        self.handler.close()
+
+
+def create_sink(sink, path, max_bytes=10 * 1024 * 1024, backups=5, ring_size=4 * 1024 * 1024):
+    # {pid} no caminho separa o arquivo de cada worker (dois processos não podem rotacionar o mesmo arquivo)
+    path = path.format(pid=os.getpid())
+    if sink == 'stderr': handler = logging.StreamHandler(sys.stderr)
+    elif sink == 'file': handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                                        encoding='utf-8', delay=True)
+    elif sink == 'ring': handler = RingBufferHandler(path, ring_size)
+    else: raise ValueError(f"Unknown LOG_SINK: {sink!r} (expected 'stderr', 'file' or 'ring')")
+    handler.setFormatter(JSONFormatter())
+    return handler
+
+
+def configure_logging(app, sink='stderr', path='api.log', level='INFO', queue_size=10000, max_bytes=10 * 1024 * 1024,
+                      backups=5, ring_size=4 * 1024 * 1024, sample=None, limits=None):
+    # O root fica só com o QueueHandler; app.logger (sem o handler padrão do Flask), werkzeug e os demais
+    # loggers propagam para ele. Nas regras, 'app' é atalho para o nome do app.logger ('server' ou '__main__').
+    from flask.logging import default_handler
+    rename = lambda rules: {app.logger.name if name == 'app' else name: value for name, value in (rules or {}).items()}
+    pipeline = LogPipeline(create_sink(sink, path, max_bytes, backups, ring_size), queue_size,
+                           rename(sample), rename(limits))
+    app.logger.removeHandler(default_handler)
+    root = logging.getLogger()
+    for handler in root.handlers[:]: root.removeHandler(handler)
+    root.addHandler(pipeline.queue_handler)
+    root.setLevel(level)
+    pipeline.start()
+    return pipeline
+
+
+if __name__ == '__main__':
+    # Mostra o conteúdo de um ring buffer: python log_pipeline.py api.ring
+    for line in read_ring(sys.argv[1]): print(line)
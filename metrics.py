@@ -0,0 +1,97 @@
+import threading
+from bisect import bisect_left
+
+# --- Métricas de requisições (formato texto do Prometheus) ---
+# Histogramas de buckets fixos por (método, endpoint, status). Cada série tem o próprio lock,
+# então só requisições do mesmo endpoint com o mesmo status disputam o mesmo lock, e por pouco tempo.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # último = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._series = {} # (method, endpoint, status) -> (latência, tamanho da requisição, tamanho da resposta)
+        self._series_lock = threading.Lock()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+
+    def _get_series(self, key):
+        series = self._series.get(key)
+        if series is None:
+            with self._series_lock:
+                series = self._series.setdefault(
+                    key, (Histogram(LATENCY_BUCKETS), Histogram(SIZE_BUCKETS), Histogram(SIZE_BUCKETS)))
+        return series
+
+    def request_started(self, endpoint):
+        with self._in_flight_lock:
+            self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+
+    def request_finished(self, endpoint):
+        with self._in_flight_lock:
+            self._in_flight[endpoint] -= 1
+
+    def observe(self, method, endpoint, status, seconds, request_bytes, response_bytes):
+        latency, request_size, response_size = self._get_series((method, endpoint, str(status)))
+        latency.observe(seconds)
+        if request_bytes is not None: request_size.observe(request_bytes)
+        if response_bytes is not None: response_size.observe(response_bytes)
+
+    def render(self):
+        lines = []
+        with self._series_lock:
+            series = sorted(self._series.items())
+        histograms = (
+            ('http_request_duration_seconds', 'Request latency in seconds.', 0),
+            ('http_request_size_bytes', 'Request body size in bytes.', 1),
+            ('http_response_size_bytes', 'Response body size in bytes.', 2),
+        )
+        for name, help_text, position in histograms:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, endpoint, status), histograms_for_key in series:
+                histogram = histograms_for_key[position]
+                counts, total, count = histogram.snapshot()
+                if not count: continue
+                labels = f'method="{method}",endpoint="{_escape(endpoint)}",status="{status}"'
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {total}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        lines.append("# HELP http_requests_in_flight Requests currently being handled.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        with self._in_flight_lock:
+            in_flight = sorted(self._in_flight.items())
+        for endpoint, value in in_flight:
+            lines.append(f'http_requests_in_flight{{endpoint="{_escape(endpoint)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
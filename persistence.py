@@ -0,0 +1,191 @@
+import os
+import re
+import zlib
+import time
+import pickle
+import struct
+import logging
+import threading
+
+# --- Persistência do MemoryStore: snapshot + journal ---
+# Cada mutação do store grava no journal (append-only) o estado completo do registro alterado, ainda
+# dentro do lock do store; o fsync é feito em lote por uma thread a cada fsync_interval segundos
+# (0 = fsync a cada escrita). Periodicamente o estado inteiro vira um snapshot em pickle (protocolo 5)
+# e os journals anteriores são apagados. Na inicialização: carrega o snapshot e reaplica o journal.
+# Como as entradas são upserts do registro inteiro, reaplicar uma entrada já refletida no snapshot
+# não muda nada; por isso o snapshot não precisa parar o store enquanto é serializado.
+# Os arquivos são pickle: só carregue diretórios escritos pelo próprio servidor. Um processo por diretório.
+
+SNAPSHOT_FILE = 'snapshot.pickle'
+JOURNAL_FILE = 'journal-{:08d}.log'
+JOURNAL_PATTERN = re.compile(r'^journal-(\d{8})\.log$')
+
+logger = logging.getLogger(__name__)
+
+
+def journal_path(directory, generation):
+    return os.path.join(directory, JOURNAL_FILE.format(generation))
+
+
+def journal_generations(directory):
+    return sorted(int(match.group(1)) for match in map(JOURNAL_PATTERN.match, os.listdir(directory)) if match)
+
+
+class Journal:
+    RECORD = struct.Struct('<II') # tamanho, crc32 do pickle
+
+    def __init__(self, directory, generation, fsync_interval=0.05):
+        self.directory = directory
+        self.generation = generation
+        self.entries = 0 # escritas na geração atual
+        self.fsync_interval = fsync_interval
+        self._file = open(journal_path(directory, generation), 'ab')
+        self._dirty = False
+        self._lock = threading.Lock()      # escrita no buffer do arquivo
+        self._sync_lock = threading.Lock() # fsync e troca de arquivo não podem se sobrepor
+        self._closed = threading.Event()
+        self._thread = None
+        if fsync_interval > 0:
+            self._thread = threading.Thread(target=self._sync_loop, name='journal-fsync', daemon=True)
+            self._thread.start()
+
+    def append(self, entry):
+        data = pickle.dumps(entry, protocol=5)
+        with self._lock:
+            self._file.write(self.RECORD.pack(len(data), zlib.crc32(data)) + data)
+            self.entries += 1
+            if self.fsync_interval > 0:
+                self._dirty = True
+            else:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def sync(self):
+        with self._sync_lock:
+            with self._lock:
+                if not self._dirty: return
+                self._file.flush()
+                self._dirty = False
+            os.fsync(self._file.fileno()) # fora do _lock: as escritas continuam enquanto o disco confirma
+
+    def _sync_loop(self):
+        while not self._closed.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Journal fsync failed")
+
+    def rotate(self):
+        # Passa a escrever na próxima geração; devolve o número dela
+        with self._sync_lock, self._lock:
+            self._close_file()
+            self.generation += 1
+            self.entries = 0
+            self._file = open(journal_path(self.directory, self.generation), 'ab')
+            return self.generation
+
+    def _close_file(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None: self._thread.join()
+        with self._sync_lock, self._lock:
+            self._close_file()
+
+
+def read_journal(path):
+    # Entradas válidas em ordem. Para no primeiro registro incompleto ou corrompido
+    # (queda no meio de uma escrita): o que vem depois dele não é confiável.
+    header = Journal.RECORD
+    with open(path, 'rb') as f:
+        while True:
+            raw = f.read(header.size)
+            if len(raw) < header.size: return
+            size, crc = header.unpack(raw)
+            data = f.read(size)
+            if len(data) < size or zlib.crc32(data) != crc:
+                logger.warning("Journal %s: truncated or corrupt record at offset %d, ignoring the rest.",
+                               path, f.tell() - len(data) - header.size)
+                return
+            yield pickle.loads(data)
+
+
+def write_snapshot(directory, state):
+    # Escreve num arquivo temporário e troca de uma vez: um snapshot pela metade nunca substitui o anterior
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(state, f, protocol=5)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def read_snapshot(directory):
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    if not os.path.exists(path): return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class Persistence:
+    def __init__(self, store, directory, fsync_interval=0.05, snapshot_interval=300):
+        os.makedirs(directory, exist_ok=True)
+        self.store = store
+        self.directory = directory
+        start = time.perf_counter()
+        snapshot = read_snapshot(directory)
+        first_generation = 0
+        if snapshot is not None:
+            store.restore(snapshot)
+            first_generation = snapshot['journal']
+        generations = [generation for generation in journal_generations(directory) if generation >= first_generation]
+        replayed = 0
+        for generation in generations:
+            for entry in read_journal(journal_path(directory, generation)):
+                store.apply(entry)
+                replayed += 1
+        logger.info("Store loaded from %s in %.2fs (snapshot: %s, %d journal entries replayed).", directory,
+                    time.perf_counter() - start, 'yes' if snapshot is not None else 'no', replayed)
+
+        # Sempre um arquivo novo: um registro incompleto no fim do journal anterior fica isolado
+        self.journal = Journal(directory, max(generations, default=first_generation) + 1, fsync_interval)
+        store.attach_journal(self.journal)
+        self._snapshot_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+        if snapshot_interval > 0:
+            self._thread = threading.Thread(target=self._snapshot_loop, args=(snapshot_interval,),
+                                            name='store-snapshot', daemon=True)
+            self._thread.start()
+
+    def snapshot(self):
+        # Nada mudou desde o último snapshot: mantém o atual
+        with self._snapshot_lock:
+            if not self.journal.entries: return
+            start = time.perf_counter()
+            state = self.store.snapshot_state(self.journal.rotate)
+            write_snapshot(self.directory, state)
+            for generation in journal_generations(self.directory):
+                if generation < state['journal']: os.remove(journal_path(self.directory, generation))
+            logger.info("Store snapshot written in %.2fs (journal generation %d).",
+                        time.perf_counter() - start, state['journal'])
+
+    def _snapshot_loop(self, interval):
+        while not self._closed.wait(interval):
+            try:
+                self.snapshot()
+            except Exception:
+                logger.exception("Store snapshot failed")
+
+    def close(self):
+        # Snapshot final: o próximo start não precisa reaplicar journal
+        if self._closed.is_set(): return
+        self._closed.set()
+        if self._thread is not None: self._thread.join()
+        self.snapshot()
+        self.store.attach_journal(None)
+        self.journal.close()
+        if not self.journal.entries: os.remove(journal_path(self.directory, self.journal.generation))
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+# --- Limite de taxa e controle de admissão ---
+# RateLimiter: token bucket por (classe de rota, cliente), com taxa e rajada próprias de cada classe.
+# ConcurrencyLimiter: teto de requisições simultâneas, no total e por classe; sem vaga a requisição é
+# recusada na hora em vez de esperar numa fila que só aumenta a latência de todas.
+# Os dois são por processo: com vários workers, cada um aplica os próprios limites.
+
+
+def parse_budgets(text):
+    # "auth=10/20,catalog=200" -> {"auth": (10.0, 20.0), "catalog": (200.0, 200.0)} (taxa por segundo / rajada)
+    budgets = {}
+    for part in text.split(','):
+        if part.strip():
+            name, _, value = part.partition('=')
+            rate, _, burst = value.partition('/')
+            rate, burst = float(rate), float(burst or rate)
+            # Taxa 0 nunca recarrega o balde (o Retry-After dividiria por zero); rajada < 1 não deixa passar nada
+            if rate <= 0 or burst < 1:
+                raise ValueError(f"Invalid RATE_LIMITS entry {part.strip()!r}: rate must be > 0 and burst >= 1")
+            budgets[name.strip()] = (rate, burst)
+    return budgets
+
+
+def parse_limits(text):
+    # "auth=4,checkout=16" -> {"auth": 4, "checkout": 16}
+    limits = {}
+    for part in text.split(','):
+        if part.strip():
+            name, _, value = part.partition('=')
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class RateLimiter:
+    # Estado [fichas, instante da última recarga] num OrderedDict usado como LRU de até max_keys entradas:
+    # O(1) por requisição e memória limitada. Um cliente expulso do LRU volta com o balde cheio.
+    def __init__(self, budgets, max_keys=100000):
+        self.budgets = budgets # classe -> (taxa, rajada); classe sem orçamento não é limitada
+        self.max_keys = max(max_keys, 1)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, route_class, client):
+        # 0 se a requisição pode seguir; senão, segundos até haver uma ficha
+        budget = self.budgets.get(route_class)
+        if budget is None: return 0
+        rate, burst = budget
+        key = (route_class, client)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                if len(self._buckets) > self.max_keys: self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_total=0, per_class=None):
+        # 0 = sem limite
+        self._total = threading.BoundedSemaphore(max_total) if max_total > 0 else None
+        self._per_class = {name: threading.BoundedSemaphore(limit) for name, limit in (per_class or {}).items() if limit > 0}
+
+    def try_acquire(self, route_class):
+        # Semáforos adquiridos (devolver com release) ou None se não há vaga
+        acquired = []
+        for semaphore in (self._per_class.get(route_class), self._total):
+            if semaphore is None: continue
+            if not semaphore.acquire(blocking=False):
+                self.release(acquired)
+                return None
+            acquired.append(semaphore)
+        return acquired
+
+    def release(self, acquired):
+        for semaphore in acquired: semaphore.release()
@@ -0,0 +1,158 @@
+import sys
+import time
+from dataclasses import dataclass
+from operator import attrgetter
+from datetime import datetime, timedelta, timezone
+
+# --- Registros compactos ---
+# Tipos usados pelo MemoryStore no lugar de dicts. Com __slots__ cada instância guarda só os valores
+# (sem __dict__ por registro nem chaves repetidas) e os timestamps são inteiros: microssegundos desde
+# a época, em UTC. A conversão para dict/ISO 8601 acontece só na saída do store (to_dict), então o
+# formato das respostas não muda. Username e status são internados: milhões de pedidos de poucos
+# usuários compartilham a mesma string.
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+TIMESTAMP_FIELDS = frozenset(('created_at', 'updated_at'))
+
+
+def now_timestamp():
+    return time.time_ns() // 1000
+
+
+def format_timestamp(ts):
+    # Mesmo formato de datetime.utcnow().isoformat()
+    return (EPOCH + timedelta(microseconds=ts)).isoformat()
+
+
+def parse_timestamp(text):
+    value = datetime.fromisoformat(text)
+    if value.tzinfo is not None: value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // MICROSECOND
+
+
+def as_timestamp(value):
+    # Aceita o inteiro ou uma string ISO (registros antigos, importações)
+    if value is None or isinstance(value, int): return value
+    return parse_timestamp(value)
+
+
+class Record:
+    __slots__ = ()
+
+    def __reduce__(self):
+        # Pickle compacto (snapshot/journal): (classe, valores na ordem dos campos), sem dict de estado
+        return type(self), type(self)._values(self)
+
+    def update(self, fields):
+        # Campo desconhecido levanta AttributeError: não há __dict__ para guardar chaves extras
+        for field, value in fields.items():
+            setattr(self, field, as_timestamp(value) if field in TIMESTAMP_FIELDS else value)
+
+
+@dataclass(slots=True)
+class User(Record):
+    # O username é a chave do store, não um campo do registro
+    password_hash: str
+    email: str = None
+    full_name: str = None
+    address: str = None
+    is_admin: bool = False
+    created_at: int = 0
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['password_hash'], data.get('email'), data.get('full_name'), data.get('address'),
+                   bool(data.get('is_admin')), as_timestamp(data['created_at']))
+
+    def to_dict(self):
+        return {"password_hash": self.password_hash, "email": self.email, "full_name": self.full_name,
+                "address": self.address, "is_admin": self.is_admin, "created_at": format_timestamp(self.created_at)}
+
+
+@dataclass(slots=True)
+class Item(Record):
+    item_id: str
+    name: str
+    description: str
+    price: float
+    stock: int
+    created_at: int
+    updated_at: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['item_id'], data['name'], data.get('description', ''), data['price'], data['stock'],
+                   as_timestamp(data['created_at']), as_timestamp(data.get('updated_at')))
+
+    def to_dict(self):
+        item = {"item_id": self.item_id, "name": self.name, "description": self.description, "price": self.price,
+                "stock": self.stock, "created_at": format_timestamp(self.created_at)}
+        if self.updated_at is not None: item["updated_at"] = format_timestamp(self.updated_at)
+        return item
+
+
+@dataclass(slots=True)
+class Review(Record):
+    item_id: str
+    username: str
+    rating: float
+    comment: str
+    created_at: int
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['item_id'], sys.intern(data['username']), data['rating'], data['comment'],
+                   as_timestamp(data['created_at']))
+
+    def to_dict(self):
+        return {"item_id": self.item_id, "username": self.username, "rating": self.rating,
+                "comment": self.comment, "created_at": format_timestamp(self.created_at)}
+
+
+@dataclass(slots=True)
+class OrderLine(Record):
+    item_id: str
+    name: str
+    quantity: int
+    price_at_purchase: float
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['item_id'], data['name'], data['quantity'], data['price_at_purchase'])
+
+    def to_dict(self):
+        return {"item_id": self.item_id, "name": self.name, "quantity": self.quantity,
+                "price_at_purchase": self.price_at_purchase}
+
+
+@dataclass(slots=True)
+class Order(Record):
+    order_id: str
+    username: str
+    items: tuple # (OrderLine, ...)
+    total_amount: float
+    shipping_address: str
+    status: str
+    created_at: int
+    payment_method: str = None
+    payment_details_masked: str = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['order_id'], sys.intern(data['username']), tuple(map(OrderLine.from_dict, data['items'])),
+                   data['total_amount'], data.get('shipping_address'), sys.intern(data['status']),
+                   as_timestamp(data['created_at']), data.get('payment_method'), data.get('payment_details_masked'))
+
+    def to_dict(self):
+        order = {"order_id": self.order_id, "username": self.username,
+                 "items": [line.to_dict() for line in self.items], "total_amount": self.total_amount,
+                 "shipping_address": self.shipping_address, "status": self.status,
+                 "created_at": format_timestamp(self.created_at)}
+        if self.payment_method is not None: order["payment_method"] = self.payment_method
+        if self.payment_details_masked is not None: order["payment_details_masked"] = self.payment_details_masked
+        return order
+
+
+for _record_class in (User, Item, Review, OrderLine, Order):
+    _record_class._values = attrgetter(*_record_class.__slots__)
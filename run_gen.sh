@@ -4,6 +4,28 @@ export NUM_SIMULTANEOUS_USERS="10"
 export REQUEST_DELAY_MIN_S="0.3"
 export REQUEST_DELAY_MAX_S="1.5"
 export RUN_DURATION_SECONDS="0" # 0 para rodar indefinidamente (ou até Ctrl+C)
+export GEN_ENGINE="auto" # async (aiohttp), thread ou auto
+export GEN_MAX_CONNECTIONS="1000" # conexões keep-alive do motor async
+export GEN_VERBOSE="1" # 0 para silenciar as mensagens por passo com muitos usuários
+export GEN_PROCESSES="1" # >1 divide usuários e orçamento de req/s entre processos filhos
+export GEN_MAX_RPS="0" # limite total de requisições/s (0 = sem limite)
+export GEN_REPORT_INTERVAL_S="5" # intervalo do relatório de throughput/latência
+# Open-loop: GEN_MODE=open inicia sessões na taxa do perfil (constant, ramp, step, spike), sem esperar o servidor
+export GEN_MODE="closed"
+export GEN_LOAD_PROFILE="constant"
+export GEN_ARRIVAL_RATE="5" # sessões/s (taxa base)
+export GEN_PEAK_RATE="0" # taxa final/pico para ramp, step e spike (0 = igual à base)
+export GEN_MAX_SESSIONS="10000" # sessões ativas por processo antes de descartar chegadas
+export GEN_REPORT_FILE="" # ex. report.json ou report.csv: relatório final por endpoint
+export GEN_PAYLOAD_POOL_SIZE="1000" # cadastros/cartões gerados pelo Faker antes de começar (0 = gerar por sessão)
+export GEN_SEED_ITEMS="0" # itens criados em lote no início (POST /api/admin/items)
+export GEN_PAYLOAD_FILE="" # ex. payloads.jsonl: carrega o pool se existir, senão gera e salva
+# Gravação/replay: GEN_RECORD_FILE grava as sessões em JSONL; GEN_REPLAY_FILE reenvia uma gravação
+# (mesmo estado inicial do servidor) no tempo gravado dividido por GEN_REPLAY_SPEED (0 = o mais rápido possível)
+export GEN_RECORD_FILE=""
+export GEN_REPLAY_FILE=""
+export GEN_REPLAY_SPEED="1"
+export GEN_REPLAY_WAIT_TIMEOUT="10" # segundos que uma requisição espera pelo login/IDs de outra sessão
 
 # Admin credentials (devem corresponder ao definido em api_server.py)
 export ADMIN_USERNAME="admin"
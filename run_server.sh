@@ -5,6 +5,53 @@ export FLASK_RUN_PORT=5001
 # Para chaves, você pode definir aqui ou deixar o padrão no api_server.py
 export SECRET_KEY='my_flask_secret'
 export JWT_SECRET_KEY='my_jwt_secret'
+# Hash de senhas: método/custo (mudanças são aplicadas no próximo login de cada usuário) e processos dedicados
+export PASSWORD_HASH_METHOD="scrypt"
+export PASSWORD_HASH_ITERATIONS="0"
+export PASSWORD_HASH_WORKERS="2"
+# Armazenamento: memory (padrão, um processo) ou sqlite (arquivo em modo WAL, compartilhado entre workers)
+export STORAGE_BACKEND="memory"
+export SQLITE_PATH="teste_api.db"
+# Persistência do store em memória (snapshot + journal); vazio desativa. Fsync do journal a cada 50 ms, snapshot a cada 5 min
+export PERSIST_DIR=""
+export PERSIST_FSYNC_INTERVAL="0.05"
+export PERSIST_SNAPSHOT_INTERVAL="300"
+# JSON: orjson quando instalado (auto), saída compacta sempre (1), indentada (0) ou só fora do debug (vazio)
+export JSON_BACKEND="auto"
+export JSON_COMPACT="1"
+# Compressão (Accept-Encoding): br requer o pacote brotli; respostas menores que o mínimo vão sem compressão
+export COMPRESSION_ENCODINGS="br,gzip"
+export COMPRESSION_MIN_SIZE="1024"
+export COMPRESSION_GZIP_LEVEL="6"
+export COMPRESSION_BROTLI_LEVEL="4"
+# Logging JSON assíncrono: destino stderr, file (rotativo) ou ring (ring buffer mapeado em memória; ler com
+# python log_pipeline.py <arquivo>). Amostragem/limite por logger, ex. LOG_SAMPLE="werkzeug=0.1" LOG_RATE_LIMIT="app=200"
+export LOG_LEVEL="INFO"
+export LOG_SINK="stderr"
+export LOG_FILE="api-{pid}.log"
+export LOG_SAMPLE=""
+export LOG_RATE_LIMIT=""
+# Limite por cliente (sub do JWT ou IP) e classe de rota, em requisições/s 'classe=taxa/rajada' (429 + Retry-After).
+# Vazio desativa (padrão). Ex.: "auth=5/20,catalog=100/200,checkout=10/20,admin=50/100,default=50/100".
+# Não ligue para medir com gen.py: todos os logins do gerador vêm do mesmo IP.
+export RATE_LIMITS=""
+export RATE_LIMIT_MAX_KEYS="100000"
+# Teto de requisições simultâneas por processo, total e por classe; acima dele 503 imediato (0/vazio = sem limite)
+# Ex.: MAX_CONCURRENT_REQUESTS="64" CONCURRENCY_LIMITS="auth=4"
+export MAX_CONCURRENT_REQUESTS="0"
+export CONCURRENCY_LIMITS=""
 
-echo "Starting Simple Flask API on port $FLASK_RUN_PORT..."
-python3 server.py
+# Modo de execução: gunicorn (produção, Linux/macOS), waitress (produção, qualquer SO) ou dev (app.run)
+export SERVER_MODE="gunicorn"
+export WEB_WORKERS="0" # 0 = 1 com STORAGE_BACKEND=memory, 2*CPUs+1 com sqlite
+export WEB_THREADS="8"
+export WEB_KEEPALIVE="5"
+export WEB_GRACEFUL_TIMEOUT="30"
+export FLASK_DEBUG="0" # só para SERVER_MODE=dev: 1 liga reloader e debugger
+
+echo "Starting Simple Flask API on port $FLASK_RUN_PORT ($SERVER_MODE)..."
+case "$SERVER_MODE" in
+    gunicorn) exec gunicorn -c gunicorn.conf.py wsgi:app ;;
+    waitress) exec python3 wsgi.py ;;
+    *) exec python3 server.py ;;
+esac
@@ -0,0 +1,77 @@
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+
+# --- Busca no catálogo ---
+# Índice invertido (termo -> ids dos itens) sobre nome e descrição, e índice de preço ordenado
+# [(preço, item_id)] para filtros de faixa. Os dois são atualizados item a item pelo MemoryStore;
+# o SQLiteStore usa FTS5 + índice em items(price) com a mesma tokenização.
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+MAX_ID = '\uffff' # maior que qualquer item_id (UUID), para bisect por preço
+
+
+def tokenize(text):
+    # Minúsculas e sem acentos: "Câmera HD-200" -> ["camera", "hd", "200"]
+    text = unicodedata.normalize('NFKD', text or '').lower()
+    return TOKEN_PATTERN.findall(''.join(ch for ch in text if not unicodedata.combining(ch)))
+
+
+class CatalogIndex:
+    # Não é thread-safe: quem chama protege com um lock
+    def __init__(self):
+        self._postings = {}  # termo -> {item_id}
+        self._terms = {}     # item_id -> termos indexados (para remover sem reprocessar o texto)
+        self._prices = []    # [(preço, item_id)] ordenado
+        self._price_of = {}  # item_id -> preço indexado
+
+    def add(self, item_id, name, description, price):
+        # Também serve para reindexar um item alterado
+        if item_id in self._terms: self.remove(item_id)
+        terms = set(tokenize(name)) | set(tokenize(description))
+        self._terms[item_id] = terms
+        for term in terms:
+            self._postings.setdefault(term, set()).add(item_id)
+        insort(self._prices, (price, item_id))
+        self._price_of[item_id] = price
+
+    def add_many(self, entries):
+        # Carga inicial num índice vazio: [(item_id, name, description, price)], ordenando os preços uma vez só
+        for item_id, name, description, price in entries:
+            terms = set(tokenize(name)) | set(tokenize(description))
+            self._terms[item_id] = terms
+            for term in terms:
+                self._postings.setdefault(term, set()).add(item_id)
+            self._prices.append((price, item_id))
+            self._price_of[item_id] = price
+        self._prices.sort()
+
+    def remove(self, item_id):
+        terms = self._terms.pop(item_id, None)
+        if terms is None: return
+        for term in terms:
+            item_ids = self._postings[term]
+            item_ids.discard(item_id)
+            if not item_ids: del self._postings[term]
+        entry = (self._price_of.pop(item_id), item_id)
+        del self._prices[bisect_left(self._prices, entry)]
+
+    def search(self, terms, min_price=None, max_price=None):
+        # ids dos itens com todos os termos e preço em [min_price, max_price], ordenados por (preço, item_id)
+        lo = bisect_left(self._prices, (min_price, '')) if min_price is not None else 0
+        hi = bisect_right(self._prices, (max_price, MAX_ID)) if max_price is not None else len(self._prices)
+        if not terms:
+            return [item_id for _, item_id in self._prices[lo:hi]]
+        postings = []
+        for term in set(terms):
+            item_ids = self._postings.get(term)
+            if not item_ids: return []
+            postings.append(item_ids)
+        postings.sort(key=len)
+        matches = postings[0].intersection(*postings[1:])
+        # Percorre o que for menor: a faixa de preço ou os itens que casaram com os termos
+        if hi - lo <= len(matches):
+            return [item_id for _, item_id in self._prices[lo:hi] if item_id in matches]
+        price_of = self._price_of
+        return [item_id for price, item_id in sorted((price_of[item_id], item_id) for item_id in matches)
+                if (min_price is None or price >= min_price) and (max_price is None or price <= max_price)]
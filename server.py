@@ -1,10 +1,29 @@
 import os
+import math
+import atexit
 import uuid
+import base64
+import binascii
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from itertools import islice
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import Flask, request, jsonify, g, current_app
+from flask import Flask, Response, request, jsonify, g, current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
+from storage import create_store
+from records import now_timestamp, format_timestamp, parse_timestamp
+from metrics import RequestMetrics
+from search import tokenize
+from json_provider import configure_json
+from compression import Compressor, set_encoding
+from log_pipeline import configure_logging, parse_log_rules
+from ratelimit import RateLimiter, ConcurrencyLimiter, parse_budgets, parse_limits
 
 # --- Configurações ---
 class Config:
@@ -12,35 +31,150 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or '123 de oliveira quatro'
     JWT_ALGORITHM = 'HS256'
     JWT_EXPIRATION_DELTA = timedelta(hours=1)
+    JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 10000)) # 0 desativa o cache de tokens verificados
     PREDEFINED_ADMIN_USERNAME = "admin"
     PREDEFINED_ADMIN_PASSWORD = "adminpassword"
+    # Hash de senhas (formatos do Werkzeug): 'scrypt' ou 'pbkdf2[:sha256]'. PASSWORD_HASH_ITERATIONS é o
+    # número de iterações no pbkdf2 ou o fator N no scrypt (0 = padrão do Werkzeug); quando definido,
+    # substitui o que o método já trouxer (ex.: 'pbkdf2:sha256:600000').
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 0))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) # processos para hashing (0 = na thread do request)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory') # 'memory' ou 'sqlite'
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', 'teste_api.db')
+    # Só com memory: snapshot + journal em PERSIST_DIR (vazio desativa); o start seguinte recarrega os dados.
+    # PERSIST_FSYNC_INTERVAL: segundos entre fsyncs do journal (0 = a cada escrita).
+    PERSIST_DIR = os.environ.get('PERSIST_DIR', '')
+    PERSIST_FSYNC_INTERVAL = float(os.environ.get('PERSIST_FSYNC_INTERVAL', 0.05))
+    PERSIST_SNAPSHOT_INTERVAL = float(os.environ.get('PERSIST_SNAPSHOT_INTERVAL', 300)) # 0 = só ao encerrar
+    CART_BATCH_MAX_ITEMS = int(os.environ.get('CART_BATCH_MAX_ITEMS', 100)) # linhas por POST /api/cart/items
+    CART_VIEW_CACHE_SIZE = int(os.environ.get('CART_VIEW_CACHE_SIZE', 10000)) # carrinhos enriquecidos em cache (0 desativa)
+    BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS', 10000)) # linhas por POST /api/admin/items
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto') # 'orjson', 'stdlib' ou 'auto' (orjson se instalado)
+    # Saída compacta: '1' sempre, '0' indentada, vazio = compacta exceto em modo debug
+    JSON_COMPACT = {'1': True, '0': False}.get(os.environ.get('JSON_COMPACT', ''))
+    JSON_SORT_KEYS = os.environ.get('JSON_SORT_KEYS', '0') == '1'
+    # Compressão de respostas: codificações em ordem de preferência (vazio desativa), tamanho mínimo e níveis
+    COMPRESSION_ENCODINGS = [e.strip() for e in os.environ.get('COMPRESSION_ENCODINGS', 'br,gzip').split(',') if e.strip()]
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_LEVEL = int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 4))
+    # Logging em JSON gravado por uma thread em segundo plano. LOG_SINK: 'stderr', 'file' (rotativo em LOG_FILE)
+    # ou 'ring' (ring buffer de LOG_RING_SIZE bytes em LOG_FILE). Com vários workers use {pid} em LOG_FILE.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_SINK = os.environ.get('LOG_SINK', 'stderr')
+    LOG_FILE = os.environ.get('LOG_FILE', 'api.log')
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024)) # tamanho de cada arquivo antes de rotacionar
+    LOG_BACKUPS = int(os.environ.get('LOG_BACKUPS', 5))
+    LOG_RING_SIZE = int(os.environ.get('LOG_RING_SIZE', 4 * 1024 * 1024))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000)) # fila cheia descarta registros em vez de bloquear
+    # Por logger ('app' = app.logger, '' = todos): fração amostrada ('werkzeug=0.1') e registros/s ('app=200')
+    LOG_SAMPLE = parse_log_rules(os.environ.get('LOG_SAMPLE', ''))
+    LOG_RATE_LIMIT = parse_log_rules(os.environ.get('LOG_RATE_LIMIT', ''))
+    # Token bucket por cliente (sub do JWT ou IP) e classe de rota: 'classe=taxa/rajada' em requisições/s.
+    # Classes: auth (login/registro), catalog (leitura de itens), checkout (pedido e pagamento), admin, default.
+    # Classe ausente não é limitada. Excedido: 429 com Retry-After. Desligado por padrão (ver README), ex.:
+    # RATE_LIMITS='auth=5/20,catalog=100/200,checkout=10/20,admin=50/100,default=50/100'
+    RATE_LIMITS = parse_budgets(os.environ.get('RATE_LIMITS', ''))
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000)) # baldes em memória (LRU)
+    # Requisições simultâneas por processo, no total e por classe ('auth=4'); sem vaga: 503 na hora. 0 = sem limite.
+    MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', 0))
+    CONCURRENCY_LIMITS = parse_limits(os.environ.get('CONCURRENCY_LIMITS', ''))
 
 app = Flask(__name__)
 app.config.from_object(Config)
-
-# --- Simulação de Banco de Dados em Memória ---
-users = {}
-items = {}
-reviews = {}
-carts = {}
-orders = {}
+configure_json(app, app.config['JSON_BACKEND'], app.config['JSON_COMPACT'], app.config['JSON_SORT_KEYS'])
+
+# --- Hash de senhas ---
+# O hashing é caro de propósito; com PASSWORD_HASH_WORKERS > 0 ele roda num pool de processos,
+# liberando o GIL para as outras threads enquanto uma rajada de logins é processada.
+class PasswordHasher:
+    def __init__(self, method, iterations, workers):
+        if iterations:
+            # PASSWORD_HASH_ITERATIONS vence o parâmetro que já vier no método (pbkdf2:<hash>:<n> / scrypt:<n>:<r>:<p>)
+            name, *params = method.split(':')
+            if name == 'pbkdf2': method = f"pbkdf2:{params[0] if params else 'sha256'}:{iterations}"
+            elif name == 'scrypt': method = ':'.join(['scrypt', str(iterations), *(params[1:] if len(params) == 3 else ['8', '1'])])
+        # Forma canônica (com parâmetros explícitos) para comparar com o prefixo dos hashes gravados
+        self.method = generate_password_hash('', method).split('$', 1)[0]
+        self._executor = None
+        if workers > 0:
+            start_methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in start_methods else None)
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            # Com 'fork' os processos nascem no primeiro submit: fazemos isso agora, antes de existirem threads
+            self._executor.submit(int).result()
+
+    def _run(self, fn, *args):
+        if self._executor is None: return fn(*args)
+        return self._executor.submit(fn, *args).result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method
+
+    def close(self):
+        if self._executor is not None: self._executor.shutdown(wait=True, cancel_futures=True)
+
+password_hasher = PasswordHasher(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_ITERATIONS'],
+                                 app.config['PASSWORD_HASH_WORKERS'])
+
+# --- Logging (ver log_pipeline.py) ---
+# Iniciado depois do pool de hashing: a thread do listener não deve existir quando os processos são criados.
+log_pipeline = configure_logging(app, app.config['LOG_SINK'], app.config['LOG_FILE'], app.config['LOG_LEVEL'],
+                                 app.config['LOG_QUEUE_SIZE'], app.config['LOG_MAX_BYTES'], app.config['LOG_BACKUPS'],
+                                 app.config['LOG_RING_SIZE'], app.config['LOG_SAMPLE'], app.config['LOG_RATE_LIMIT'])
+
+# --- Armazenamento (memória ou SQLite, ver storage.py) ---
+store = create_store(app.config)
+
+# Cache do catálogo serializado: reconstruído só quando a versão do catálogo no store muda.
+# As versões comprimidas são geradas sob demanda, uma vez por versão e codificação.
+catalog_cache = (-1, None, None, {}) # (version, body, etag, {encoding: body comprimido})
+catalog_lock = threading.Lock()
+
+def get_catalog():
+    global catalog_cache
+    version = store.catalog_version()
+    cached = catalog_cache
+    if cached[0] == version: return cached
+    with catalog_lock:
+        if catalog_cache[0] == version: return catalog_cache
+        body = app.json.dumps_bytes(store.list_items())
+        # A versão é lida antes da serialização: se mudar no meio, o próximo request reconstrói
+        catalog_cache = (version, body, hashlib.md5(body).hexdigest(), {})
+        return catalog_cache
+
+def get_catalog_body(cached, encoding):
+    variants = cached[3]
+    body = variants.get(encoding)
+    if body is None:
+        with catalog_lock:
+            body = variants.get(encoding)
+            if body is None: body = variants[encoding] = compressor.compress(cached[1], encoding)
+    return body
 
 def initialize_data():
     admin_username = app.config['PREDEFINED_ADMIN_USERNAME']
-    if admin_username not in users:
-        users[admin_username] = {
-            "password_hash": generate_password_hash(app.config['PREDEFINED_ADMIN_PASSWORD']),
+    if store.get_user(admin_username) is None:
+        store.add_user(admin_username, {
+            "password_hash": password_hasher.hash(app.config['PREDEFINED_ADMIN_PASSWORD']),
             "email": "admin@example.com", "full_name": "Admin User",
             "address": "123 Admin St, Admin City", "is_admin": True,
-            "created_at": datetime.utcnow().isoformat()
-        }
+            "created_at": now_timestamp()
+        })
         print(f"Admin user '{admin_username}' initialized.")
 
-    if not items:
-        item1_id = str(uuid.uuid4())
-        items[item1_id] = {"item_id": item1_id, "name": "Laptop Pro", "description": "High-performance laptop", "price": 1200.99, "stock": 50, "created_at": datetime.utcnow().isoformat()}
-        item2_id = str(uuid.uuid4())
-        items[item2_id] = {"item_id": item2_id, "name": "Wireless Mouse", "description": "Ergonomic wireless mouse", "price": 25.50, "stock": 200, "created_at": datetime.utcnow().isoformat()}
+    # Com vários workers (sqlite) todos passam por aqui no boot: só um grava os itens de exemplo
+    if not store.count_items() and store.add_items([
+        {"item_id": str(uuid.uuid4()), "name": "Laptop Pro", "description": "High-performance laptop", "price": 1200.99, "stock": 50, "created_at": now_timestamp()},
+        {"item_id": str(uuid.uuid4()), "name": "Wireless Mouse", "description": "Ergonomic wireless mouse", "price": 25.50, "stock": 200, "created_at": now_timestamp()},
+    ], if_empty=True) is not None:
         print("Sample items initialized.")
 
 with app.app_context():
@@ -54,12 +188,47 @@ def create_jwt_token(username):
     }
     return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm=current_app.config['JWT_ALGORITHM'])
 
+# Cache LRU de tokens já verificados: token bruto -> (sub, exp). Evita refazer o HMAC a cada requisição;
+# cada entrada vale até o 'exp' do próprio token e pode ser removida no logout.
+class TokenCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None: return None
+            if entry[1] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+
+    def put(self, token, sub, exp):
+        if self.max_size <= 0: return
+        with self._lock:
+            self._entries[token] = (sub, exp)
+            self._entries.move_to_end(token)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+token_cache = TokenCache(app.config['JWT_CACHE_SIZE'])
+
 def decode_jwt_token(token):
+    username = token_cache.get(token)
+    if username is not None: return username
     try:
         payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=[current_app.config['JWT_ALGORITHM']])
-        return payload['sub']
     except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
         return None
+    token_cache.put(token, payload['sub'], payload['exp'])
+    return payload['sub']
 
 def token_required(f):
     @wraps(f)
@@ -70,9 +239,11 @@ def token_required(f):
             token = auth_header.split(" ")[1]
         if not token: return jsonify({"message": "Token is missing!"}), 401
         username = decode_jwt_token(token)
-        if not username or username not in users: return jsonify({"message": "Token is invalid or expired!"}), 401
-        g.current_user = users[username]
+        user = store.get_user(username) if username else None
+        if not user: return jsonify({"message": "Token is invalid or expired!"}), 401
+        g.current_user = user
         g.current_username = username
+        g.current_token = token
         return f(*args, **kwargs)
     return decorated_function
 
@@ -84,14 +255,97 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# --- Funções Auxiliares ---
-def get_user_cart(username):
-    carts.setdefault(username, {})
-    return carts[username]
+# --- Métricas ---
+# Registradas antes dos demais hooks: o after_request de métricas roda por último e vê a resposta final.
+# Com vários workers, cada processo expõe as próprias séries em /metrics.
+request_metrics = RequestMetrics()
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_metrics.request_started(g.metrics_endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    if 'metrics_start' in g:
+        request_metrics.observe(request.method, g.metrics_endpoint, response.status_code,
+                                time.perf_counter() - g.metrics_start, request.content_length,
+                                response.calculate_content_length())
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is not None: request_metrics.request_finished(endpoint)
+
+# --- Compressão ---
+# Registrada depois das métricas, então roda antes delas: as métricas veem o tamanho comprimido.
+compressor = Compressor(app.config['COMPRESSION_ENCODINGS'], app.config['COMPRESSION_MIN_SIZE'],
+                        app.config['COMPRESSION_GZIP_LEVEL'], app.config['COMPRESSION_BROTLI_LEVEL'])
+
+@app.after_request
+def compress_response(response):
+    return compressor.apply(request, response)
+
+# --- Limite de taxa e admissão (ver ratelimit.py) ---
+# Registrado depois das métricas: requisições recusadas (429/503) também aparecem em /metrics.
+# O token bucket vem antes do teto de concorrência: um cliente acima do orçamento não ocupa vaga.
+rate_limiter = RateLimiter(app.config['RATE_LIMITS'], app.config['RATE_LIMIT_MAX_KEYS'])
+admission = ConcurrencyLimiter(app.config['MAX_CONCURRENT_REQUESTS'], app.config['CONCURRENCY_LIMITS'])
+
+def route_class(rule, method):
+    if rule in ('/', '/metrics'): return None # health check e scrape nunca são limitados
+    if rule in ('/api/user/login', '/api/user/register'): return 'auth'
+    if rule is not None and rule.startswith('/api/admin/'): return 'admin'
+    if rule is not None and rule.startswith('/api/order/'): return 'checkout'
+    if method == 'GET' and rule in ('/api/items', '/api/items/search', '/api/item/<item_id>', '/api/item/<item_id>/reviews'): return 'catalog'
+    return 'default'
+
+def rate_limit_client():
+    # sub de um token válido (a verificação fica no token_cache para o token_required); senão o IP
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        username = decode_jwt_token(auth_header.split(" ")[1])
+        if username: return f"sub:{username}"
+    return f"ip:{request.remote_addr}"
+
+def rejected(message, status, retry_after):
+    response = jsonify({"message": message, "retry_after": retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.before_request
+def admit_request():
+    route = route_class(request.url_rule.rule if request.url_rule else None, request.method)
+    if route is None: return None
+    # Só decodifica o JWT para montar a chave quando a classe tem orçamento
+    retry_after = route in rate_limiter.budgets and rate_limiter.acquire(route, rate_limit_client())
+    if retry_after: return rejected("Too many requests, slow down.", 429, math.ceil(retry_after))
+    slots = admission.try_acquire(route)
+    if slots is None: return rejected("Server busy, try again shortly.", 503, 1)
+    g.admission_slots = slots
+
+@app.teardown_request
+def release_admission(exc):
+    slots = g.pop('admission_slots', None)
+    if slots: admission.release(slots)
 
+# --- Funções Auxiliares ---
 def mask_card_number(card_number):
     return f"xxxx-xxxx-xxxx-{card_number[-4:]}" if card_number and len(card_number) > 4 else "xxxx"
 
+# Cursores opacos para paginação: base64 url-safe da última chave retornada
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        return base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+
 # --- Endpoints da API ---
 
 # Root endpoint for health check
@@ -100,6 +354,11 @@ def health_check():
     return jsonify({"message": "working"}), 200
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 # USER
 @app.route('/api/user/register', methods=['POST'])
 def register_user():
@@ -107,13 +366,15 @@ def register_user():
     pii_fields = ['username', 'password', 'email', 'full_name', 'address']
     if not data or not all(field in data for field in pii_fields):
         return jsonify({"message": f"Missing required PII fields: {', '.join(pii_fields)}"}), 400
-    if data['username'] in users: return jsonify({"message": "Username already exists"}), 409
-    users[data['username']] = {
-        "password_hash": generate_password_hash(data['password']), "email": data['email'],
+    if store.get_user(data['username']) is not None: return jsonify({"message": "Username already exists"}), 409
+    user_data = {
+        "password_hash": password_hasher.hash(data['password']), "email": data['email'],
         "full_name": data['full_name'], "address": data['address'], "is_admin": False,
-        "created_at": datetime.utcnow().isoformat()
+        "created_at": now_timestamp()
     }
-    app.logger.info(f"User registered: {data['username']}. PII received: email, full_name, address.")
+    if not store.add_user(data['username'], user_data): return jsonify({"message": "Username already exists"}), 409
+    app.logger.info("User registered: %s. PII received: email, full_name, address.", data['username'],
+                    extra={"event": "user_registered", "username": data['username']})
     return jsonify({"message": "User registered successfully"}), 201
 
 @app.route('/api/user/login', methods=['POST'])
@@ -121,15 +382,19 @@ def login_user():
     data = request.get_json()
     if not data or not data.get('username') or not data.get('password'):
         return jsonify({"message": "Username and password required"}), 400
-    user = users.get(data['username'])
-    if not user or not check_password_hash(user['password_hash'], data['password']):
+    user = store.get_user(data['username'])
+    if not user or not password_hasher.verify(user['password_hash'], data['password']):
         return jsonify({"message": "Invalid credentials"}), 401
+    if password_hasher.needs_rehash(user['password_hash']):
+        # Custo configurado mudou: aproveita a senha em claro do login para regravar o hash
+        store.update_user(data['username'], password_hash=password_hasher.hash(data['password']))
     token = create_jwt_token(data['username'])
     return jsonify({"access_token": token, "is_admin": user.get("is_admin", False)}), 200
 
 @app.route('/api/user/logout', methods=['POST'])
 @token_required
 def logout_user():
+    token_cache.evict(g.current_token)
     return jsonify({"message": "Logout successful. Please discard the token."}), 200
 
 @app.route('/api/user/profile', methods=['GET'])
@@ -142,53 +407,238 @@ def get_user_profile():
 # ITEMS
 @app.route('/api/items', methods=['GET'])
 def list_items():
-    return jsonify(list(items.values())), 200
+    cached = get_catalog()
+    _, body, etag, _ = cached
+    encoding = compressor.negotiate(request) if len(body) >= compressor.min_size else None
+    response = Response(get_catalog_body(cached, encoding) if encoding else body, mimetype='application/json')
+    response.set_etag(etag)
+    if encoding: set_encoding(response, encoding) # o hook de compressão ignora respostas já codificadas
+    else: response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def rating_summary(item_id):
+    review_count, rating_sum = store.review_stats(item_id)
+    return {"review_count": review_count,
+            "average_rating": round(rating_sum / review_count, 2) if review_count else None}
+
+def parse_pagination(max_per_page=50):
+    # Devolve (page, per_page, after decodificado, None) ou (..., resposta de erro); page é None com cursor
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', max_per_page)), 1), max_per_page)
+    except ValueError:
+        return None, None, None, (jsonify({"message": "Invalid page or per_page parameter. Must be integers."}), 400)
+    after = request.args.get('after')
+    if after is None: return page, per_page, None, None
+    decoded = decode_cursor(after)
+    if decoded is None: return None, None, None, (jsonify({"message": "Invalid 'after' cursor."}), 400)
+    return None, per_page, decoded, None
+
+@app.route('/api/items/search', methods=['GET'])
+def search_items():
+    # q: termos (todos precisam aparecer no nome ou na descrição); min_price/max_price: faixa inclusiva;
+    # in_stock=1: só itens com estoque. Resultados ordenados por preço.
+    terms = tokenize(request.args.get('q', ''))[:10]
+    try:
+        min_price = float(request.args['min_price']) if request.args.get('min_price') else None
+        max_price = float(request.args['max_price']) if request.args.get('max_price') else None
+    except ValueError:
+        return jsonify({"message": "Invalid min_price or max_price. Must be numbers."}), 400
+    in_stock = request.args.get('in_stock', '').lower() in ('1', 'true', 'yes')
+    page, per_page, after, error = parse_pagination(max_per_page=100)
+    if error: return error
+    if after is not None: return jsonify({"message": "Search supports page-based pagination only."}), 400
+    items, total = store.search_items(terms, min_price, max_price, in_stock,
+                                      offset=(page - 1) * per_page, limit=per_page)
+    return jsonify({
+        "items": items,
+        "page": page,
+        "per_page": per_page,
+        "total_items": total,
+        "total_pages": (total + per_page - 1) // per_page
+    }), 200
 
 @app.route('/api/item/<item_id>', methods=['GET'])
 def get_item(item_id):
-    item = items.get(item_id)
-    return jsonify(item) if item else (jsonify({"message": "Item not found"}), 404)
+    item = store.get_item(item_id)
+    return jsonify({**item, **rating_summary(item_id)}) if item else (jsonify({"message": "Item not found"}), 404)
+
+@app.route('/api/item/<item_id>/reviews', methods=['GET'])
+def list_item_reviews(item_id):
+    if store.get_item(item_id) is None: return jsonify({"message": "Item not found"}), 404
+    page, per_page, after, error = parse_pagination()
+    if error: return error
+    if after is not None:
+        after_review = store.get_review(after)
+        if after_review is None or after_review['item_id'] != item_id:
+            return jsonify({"message": "Invalid 'after' cursor."}), 400
+        reviews = store.list_reviews(item_id, after=after, limit=per_page + 1)
+    else:
+        reviews = store.list_reviews(item_id, offset=(page - 1) * per_page, limit=per_page + 1)
+    has_more = len(reviews) > per_page
+    reviews = reviews[:per_page]
+    return jsonify({
+        "item_id": item_id,
+        "reviews": reviews,
+        **rating_summary(item_id),
+        "page": page,
+        "per_page": per_page,
+        "next_cursor": encode_cursor(reviews[-1]['review_id']) if has_more else None
+    }), 200
 
 @app.route('/api/item/<item_id>/review', methods=['POST'])
 @token_required
 def add_review(item_id):
-    if item_id not in items: return jsonify({"message": "Item not found"}), 404
+    if store.get_item(item_id) is None: return jsonify({"message": "Item not found"}), 404
     data = request.get_json()
     if not data or not data.get('rating') or not data.get('comment'):
         return jsonify({"message": "Rating and comment are required"}), 400
+    rating = data['rating']
+    # A nota entra nos agregados do item, então precisa ser numérica
+    if isinstance(rating, bool) or not isinstance(rating, (int, float)) or not 1 <= rating <= 5:
+        return jsonify({"message": "Rating must be a number between 1 and 5"}), 400
     review_id = str(uuid.uuid4())
-    reviews[review_id] = {
-        "item_id": item_id, "username": g.current_username, "rating": data['rating'],
-        "comment": data['comment'], "created_at": datetime.utcnow().isoformat()
-    }
+    store.add_review(review_id, {
+        "item_id": item_id, "username": g.current_username, "rating": rating,
+        "comment": data['comment'], "created_at": now_timestamp()
+    })
     return jsonify({"message": "Review added", "review_id": review_id}), 201
 
 # CART
+# Visão enriquecida do carrinho: nome, preço, estoque e total de cada linha, mais o total geral, resolvidos
+# numa única busca em lote no store. Fica em cache por usuário (LRU) junto com o carrinho de onde saiu e
+# a versão de cada item dele (store.item_versions); adicionar/remover linhas atualiza a entrada
+# incrementalmente. Só mudanças nos itens do próprio carrinho invalidam a entrada: checkouts de outros
+# usuários ou edições de outros itens não. Um carrinho alterado por outro worker também invalida (não bate
+# com o carrinho guardado).
+def cart_line(item_id, quantity, item):
+    if item is None:
+        return {"item_id": item_id, "quantity": quantity, "available": False, "line_total": 0, "message": "Item not found"}
+    return {"item_id": item_id, "name": item['name'], "price": item['price'], "quantity": quantity,
+            "stock": item['stock'], "available": item['stock'] >= quantity, "line_total": round(item['price'] * quantity, 2)}
+
+class CartViewCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict() # username -> ({item_id: versão}, carrinho, {item_id: linha}, total)
+        self._lock = threading.Lock()
+
+    def get(self, username, versions, cart):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] != cart or entry[0] != versions: return None
+            self._entries.move_to_end(username)
+            return entry[2], entry[3]
+
+    def put(self, username, versions, cart, lines, total):
+        if self.max_size <= 0: return
+        with self._lock:
+            self._entries[username] = (versions, cart, lines, total)
+            self._entries.move_to_end(username)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def update(self, username, cart, changed, versions):
+        # O carrinho virou `cart` mudando só as linhas de `changed` ({item_id: item}, itens já consultados
+        # pelo endpoint, com as versões lidas antes deles em `versions`). Recalcula essas linhas e ajusta o
+        # total; se a entrada não corresponde ao carrinho anterior (outra mudança no meio), descarta.
+        # As versões das outras linhas ficam como estavam: o get confere todas com o store.
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None: return
+            old_versions, old_cart, lines, total = entry
+            if any(cart.get(item_id) != quantity for item_id, quantity in old_cart.items() if item_id not in changed) \
+                    or any(item_id not in old_cart and item_id not in changed for item_id in cart):
+                del self._entries[username]
+                return
+            lines = dict(lines) # quem recebeu a versão anterior pode estar serializando
+            for item_id, item in changed.items():
+                old_line = lines.pop(item_id, None)
+                if old_line is not None: total -= old_line['line_total']
+                if item_id in cart:
+                    lines[item_id] = cart_line(item_id, cart[item_id], item)
+                    total += lines[item_id]['line_total']
+            # Mantém a ordem das linhas igual à do carrinho
+            lines = {item_id: lines[item_id] for item_id in cart}
+            versions = {item_id: versions[item_id] if item_id in changed else old_versions[item_id] for item_id in cart}
+            self._entries[username] = (versions, dict(cart), lines, round(total, 2))
+
+    def evict(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+cart_views = CartViewCache(app.config['CART_VIEW_CACHE_SIZE'])
+
 @app.route('/api/cart', methods=['GET'])
 @token_required
 def view_cart():
-    user_cart = get_user_cart(g.current_username)
-    # Detalhes do carrinho podem ser enriquecidos aqui se necessário
-    return jsonify({"cart_items": user_cart, "message": "Cart view (simple)"}), 200
+    username = g.current_username
+    user_cart = store.get_cart(username)
+    versions = store.item_versions(user_cart) # lidas antes dos itens: se mudarem no meio, a entrada já nasce vencida
+    cached = cart_views.get(username, versions, user_cart)
+    if cached is None:
+        items = store.get_items(user_cart)
+        lines = {item_id: cart_line(item_id, quantity, items.get(item_id)) for item_id, quantity in user_cart.items()}
+        total = round(sum(line['line_total'] for line in lines.values()), 2)
+        cart_views.put(username, versions, user_cart, lines, total)
+    else:
+        lines, total = cached
+    return jsonify({"cart_items": user_cart, "lines": list(lines.values()), "total": total,
+                    "all_available": all(line['available'] for line in lines.values())}), 200
 
 @app.route('/api/cart/item', methods=['POST'])
 @token_required
 def add_item_to_cart():
     data = request.get_json()
     item_id, quantity = data.get('item_id'), data.get('quantity', 1)
-    if not item_id or item_id not in items: return jsonify({"message": "Item not found"}), 404
+    versions = store.item_versions([item_id]) if item_id else None
+    item = store.get_item(item_id) if item_id else None
+    if not item: return jsonify({"message": "Item not found"}), 404
     if not isinstance(quantity, int) or quantity <= 0: return jsonify({"message": "Invalid quantity"}), 400
-    if items[item_id]['stock'] < quantity: return jsonify({"message": "Not enough stock"}), 400
-    user_cart = get_user_cart(g.current_username)
-    user_cart[item_id] = user_cart.get(item_id, 0) + quantity
+    if item['stock'] < quantity: return jsonify({"message": "Not enough stock"}), 400
+    user_cart = store.add_to_cart(g.current_username, item_id, quantity)
+    cart_views.update(g.current_username, user_cart, {item_id: item}, versions)
     return jsonify({"message": "Item added to cart", "cart": user_cart}), 200
 
+@app.route('/api/cart/items', methods=['POST'])
+@token_required
+def add_items_to_cart():
+    # Lote tudo ou nada: {"items": [{"item_id": ..., "quantity": ...}, ...]} (ou a lista direto).
+    # Se alguma linha for inválida nada é adicionado e a resposta traz o erro de cada linha.
+    data = request.get_json(silent=True)
+    rows = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows: return jsonify({"message": "'items' must be a non-empty list"}), 400
+    max_items = app.config['CART_BATCH_MAX_ITEMS']
+    if len(rows) > max_items: return jsonify({"message": f"Too many items (max {max_items})"}), 400
+    # Uma busca em lote para todas as linhas (versões antes dos itens)
+    item_ids = {row.get('item_id') for row in rows if isinstance(row, dict) and isinstance(row.get('item_id'), str)}
+    versions = store.item_versions(item_ids)
+    items = store.get_items(item_ids)
+    lines, errors = {}, []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict): row = {}
+        item_id, quantity = row.get('item_id'), row.get('quantity', 1)
+        item = items.get(item_id) if isinstance(item_id, str) else None
+        if not item:
+            errors.append({"row": index, "item_id": item_id, "message": "Item not found"})
+        elif isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            errors.append({"row": index, "item_id": item_id, "message": "Invalid quantity"})
+        else:
+            lines[item_id] = lines.get(item_id, 0) + quantity # linhas repetidas somam
+            if item['stock'] < lines[item_id]:
+                errors.append({"row": index, "item_id": item_id, "message": "Not enough stock"})
+    if errors: return jsonify({"message": "No items added to cart", "errors": errors}), 400
+    user_cart = store.add_many_to_cart(g.current_username, lines)
+    cart_views.update(g.current_username, user_cart, {item_id: items[item_id] for item_id in lines}, versions)
+    return jsonify({"message": f"{len(lines)} item(s) added to cart", "cart": user_cart}), 200
+
 @app.route('/api/cart/item/<item_id>', methods=['DELETE'])
 @token_required
 def remove_item_from_cart(item_id):
-    user_cart = get_user_cart(g.current_username)
-    if item_id not in user_cart: return jsonify({"message": "Item not in cart"}), 404
-    del user_cart[item_id]
+    user_cart = store.remove_from_cart(g.current_username, item_id)
+    if user_cart is None: return jsonify({"message": "Item not in cart"}), 404
+    cart_views.update(g.current_username, user_cart, {item_id: None}, {})
     return jsonify({"message": "Item removed from cart", "cart": user_cart}), 200
 
 # PAYMENT / ORDER
@@ -196,34 +646,65 @@ def remove_item_from_cart(item_id):
 @token_required
 def checkout():
     username = g.current_username
-    user_cart = get_user_cart(username)
+    user_cart = store.get_cart(username)
     if not user_cart: return jsonify({"message": "Cart is empty"}), 400
     
+    # Reserva atômica do estoque de todas as linhas (tudo ou nada)
+    reserved_items, failed_item_id = store.reserve_stock(user_cart)
+    if reserved_items is None:
+        return jsonify({"message": f"Item {failed_item_id} issue."}), 400
+
     order_items_details = []
     total_amount = 0
     for item_id, quantity in user_cart.items():
-        item_info = items.get(item_id)
-        if not item_info or item_info['stock'] < quantity:
-            return jsonify({"message": f"Item {item_id} issue."}), 400
+        item_info = reserved_items[item_id]
         order_items_details.append({"item_id": item_id, "name": item_info["name"], "quantity": quantity, "price_at_purchase": item_info["price"]})
         total_amount += item_info["price"] * quantity
-        items[item_id]['stock'] -= quantity
 
     order_id = str(uuid.uuid4())
-    orders[order_id] = {
-        "order_id": order_id, "username": username, "items": order_items_details,
-        "total_amount": round(total_amount, 2),
-        "shipping_address": users[username].get("address", "N/A"), # PII
-        "status": "pending_payment", "created_at": datetime.utcnow().isoformat()
-    }
-    carts[username] = {} # Clear cart
-    app.logger.info(f"Order {order_id} for {username}. PII (address) included.")
+    try:
+        store.add_order({
+            "order_id": order_id, "username": username, "items": order_items_details,
+            "total_amount": round(total_amount, 2),
+            "shipping_address": g.current_user.get("address", "N/A"), # PII
+            "status": "pending_payment", "created_at": now_timestamp()
+        })
+    except Exception:
+        store.release_stock(user_cart) # Devolve a reserva se o pedido não foi gravado
+        raise
+    store.clear_cart(username) # Clear cart
+    cart_views.evict(username)
+    app.logger.info("Order %s for %s. PII (address) included.", order_id, username,
+                    extra={"event": "checkout", "order_id": order_id, "username": username})
     return jsonify({"message": "Checkout successful, order created.", "order_id": order_id}), 201
 
+@app.route('/api/orders', methods=['GET'])
+@token_required
+def list_my_orders():
+    username = g.current_username
+    page, per_page, after, error = parse_pagination()
+    if error: return error
+    if after is not None:
+        after_order = store.get_order(after)
+        if after_order is None or after_order['username'] != username:
+            return jsonify({"message": "Invalid 'after' cursor."}), 400
+        orders = store.list_user_orders(username, after=after, limit=per_page + 1)
+    else:
+        orders = store.list_user_orders(username, offset=(page - 1) * per_page, limit=per_page + 1)
+    has_more = len(orders) > per_page
+    orders = orders[:per_page]
+    return jsonify({
+        "orders": orders,
+        "page": page,
+        "per_page": per_page,
+        "total_orders": store.count_orders(username),
+        "next_cursor": encode_cursor(orders[-1]['order_id']) if has_more else None
+    }), 200
+
 @app.route('/api/order/<order_id>/pay/card', methods=['POST'])
 @token_required
 def pay_by_card(order_id):
-    order = orders.get(order_id)
+    order = store.get_order(order_id)
     if not order or order['username'] != g.current_username: return jsonify({"message": "Order not found"}), 404
     if order['status'] != 'pending_payment': return jsonify({"message": "Order not pending payment"}), 400
     data = request.get_json()
@@ -231,22 +712,24 @@ def pay_by_card(order_id):
     if not data or not all(field in data for field in pii_card_fields):
         return jsonify({"message": f"Missing PII for card payment: {', '.join(pii_card_fields)}"}), 400
     
-    app.logger.info(f"Card payment for {order_id}. PII received: card_number, expiry, cvv.")
-    order['status'] = 'paid'
-    order['payment_method'] = 'card'
-    order['payment_details_masked'] = f"Card {mask_card_number(data['card_number'])}"
+    app.logger.info("Card payment for %s. PII received: card_number, expiry, cvv.", order_id,
+                    extra={"event": "payment", "order_id": order_id, "payment_method": "card"})
+    if not store.set_order_status(order_id, 'paid', expected_status='pending_payment', payment_method='card',
+                            payment_details_masked=f"Card {mask_card_number(data['card_number'])}"):
+        return jsonify({"message": "Order not pending payment"}), 400
     return jsonify({"message": "Card payment successful (simulated)"}), 200
 
 @app.route('/api/order/<order_id>/pay/pix', methods=['POST'])
 @token_required
 def pay_by_pix(order_id):
-    order = orders.get(order_id)
+    order = store.get_order(order_id)
     if not order or order['username'] != g.current_username: return jsonify({"message": "Order not found"}), 404
     if order['status'] != 'pending_payment': return jsonify({"message": "Order not pending payment"}), 400
-    order['status'] = 'paid'
-    order['payment_method'] = 'pix'
-    order['payment_details_masked'] = f"PIX Code: SIMULATED-{str(uuid.uuid4())[:8]}"
-    app.logger.info(f"PIX payment for order {order_id}.")
+    if not store.set_order_status(order_id, 'paid', expected_status='pending_payment', payment_method='pix',
+                            payment_details_masked=f"PIX Code: SIMULATED-{str(uuid.uuid4())[:8]}"):
+        return jsonify({"message": "Order not pending payment"}), 400
+    app.logger.info("PIX payment for order %s.", order_id,
+                    extra={"event": "payment", "order_id": order_id, "payment_method": "pix"})
     return jsonify({"message": "PIX payment successful (simulated)"}), 200
 
 # ADMIN
@@ -254,15 +737,77 @@ def pay_by_pix(order_id):
 @admin_required
 def admin_list_purchases():
     # Retorna PII (username, shipping_address, payment_details_masked) para o admin
-    admin_view_orders = []
-    for oid, odata in orders.items():
+    # Filtros: status, username, created_from (inclusivo), created_to (exclusivo)
+    # Paginação: after=<cursor> ou page; stream=ndjson|json serializa todos os resultados sob demanda
+    try:
+        per_page = int(request.args.get('per_page', 50))
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        return jsonify({"message": "Invalid page or per_page parameter. Must be integers."}), 400
+    per_page = min(max(per_page, 1), 500)
+    if page < 1: page = 1
+
+    created_range = []
+    for param in ('created_from', 'created_to'):
+        value = request.args.get(param)
+        if value:
+            # Normaliza para UTC sem offset, o formato gravado: o SQLiteStore compara as strings
+            try: value = format_timestamp(parse_timestamp(value))
+            except ValueError: return jsonify({"message": f"Invalid '{param}'. Must be an ISO 8601 datetime."}), 400
+        created_range.append(value)
+
+    after_order_id = None
+    after = request.args.get('after')
+    if after is not None:
+        after_order_id = decode_cursor(after)
+        if after_order_id is None or store.get_order(after_order_id) is None:
+            return jsonify({"message": "Invalid 'after' cursor."}), 400
+
+    # Parâmetro vazio = sem filtro, nos dois stores
+    filters = {"status": request.args.get('status') or None, "username": request.args.get('username') or None,
+               "created_from": created_range[0], "created_to": created_range[1]}
+    matching_orders = store.iter_orders(**filters, after=after_order_id)
+
+    def admin_order_view(odata):
         odata_copy = odata.copy()
-        user_profile = users.get(odata['username'], {})
+        user_profile = store.get_user(odata['username']) or {}
         odata_copy['user_full_name'] = user_profile.get('full_name', 'N/A') # PII
         odata_copy['user_email'] = user_profile.get('email', 'N/A') # PII
-        admin_view_orders.append(odata_copy)
-    app.logger.info(f"Admin {g.current_username} accessed all purchases. PII exposed.")
-    return jsonify(admin_view_orders), 200
+        return odata_copy
+
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in ('ndjson', 'json'):
+            return jsonify({"message": "Invalid 'stream'. Must be 'ndjson' or 'json'."}), 400
+        app.logger.info("Admin %s streamed purchases (%s). PII exposed.", g.current_username, stream,
+                        extra={"event": "admin_purchases", "admin": g.current_username, "stream": stream})
+        dumps = app.json.dumps
+        if stream == 'ndjson':
+            body = (dumps(admin_order_view(odata)) + "\n" for odata in matching_orders)
+            return Response(body, mimetype='application/x-ndjson')
+        def json_array():
+            yield "["
+            for i, odata in enumerate(matching_orders):
+                yield ("," if i else "") + dumps(admin_order_view(odata))
+            yield "]"
+        return Response(json_array(), mimetype='application/json')
+
+    if after is None and page > 1:
+        matching_orders = islice(matching_orders, (page - 1) * per_page, None)
+    page_orders = list(islice(matching_orders, per_page + 1))
+    has_more = len(page_orders) > per_page
+    admin_view_orders = [admin_order_view(odata) for odata in page_orders[:per_page]]
+    next_cursor = encode_cursor(admin_view_orders[-1]['order_id']) if has_more else None
+
+    app.logger.info("Admin %s accessed purchases (%d orders). PII exposed.", g.current_username, len(admin_view_orders),
+                    extra={"event": "admin_purchases", "admin": g.current_username, "count": len(admin_view_orders)})
+    return jsonify({
+        "orders": admin_view_orders,
+        "page": None if after is not None else page,
+        "per_page": per_page,
+        "total_orders": store.count_orders(**filters), # total com os mesmos filtros, sem o cursor
+        "next_cursor": next_cursor
+    }), 200
 
 @app.route('/api/admin/users', methods=['GET'])
 @admin_required
@@ -277,34 +822,40 @@ def admin_list_users():
     if page < 1: page = 1
     if per_page < 1: per_page = 1
     if per_page > 50: # Aplicando o limite máximo de 50 por página
-        app.logger.warning(f"Admin {g.current_username} requested {per_page} users per page, capped at 50.")
+        app.logger.warning("Admin %s requested %d users per page, capped at 50.", g.current_username, per_page)
         per_page = 50
 
-    all_user_data = []
-    # Convertendo o dicionário de usuários para uma lista para facilitar a paginação
-    # Em um banco de dados real, isso seria uma query com LIMIT e OFFSET
-    # Ordenar por username para consistência na paginação, embora não seja estritamente necessário aqui
-    sorted_usernames = sorted(users.keys()) 
-
-    for username in sorted_usernames:
-        data = users[username]
+    # Paginação por cursor (after=<cursor opaco>) ou por página; em ambos os casos só a página é copiada
+    after = request.args.get('after')
+    if after is not None:
+        after_username = decode_cursor(after)
+        if after_username is None:
+            return jsonify({"message": "Invalid 'after' cursor."}), 400
+        page = None
+        page_entries = store.list_users(after=after_username, limit=per_page + 1)
+    else:
+        page_entries = store.list_users(offset=(page - 1) * per_page, limit=per_page + 1)
+    has_more = len(page_entries) > per_page
+
+    paginated_users = []
+    for username, data in page_entries[:per_page]:
         user_copy = data.copy()
-        if 'password_hash' in user_copy:
-            del user_copy['password_hash'] # Nunca retorne o hash da senha
-        all_user_data.append({"username": username, **user_copy})
+        user_copy.pop('password_hash', None) # Nunca retorne o hash da senha
+        paginated_users.append({"username": username, **user_copy})
 
-    total_users = len(all_user_data)
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    paginated_users = all_user_data[start_index:end_index]
+    total_users = store.count_users()
+    next_cursor = encode_cursor(paginated_users[-1]['username']) if has_more else None
 
-    app.logger.info(f"Admin {g.current_username} accessed user data page {page}, {per_page} users per page. PII exposed.")
+    app.logger.info("Admin %s accessed user data (%s), %d users per page. PII exposed.", g.current_username,
+                    f"page {page}" if page else "cursor", per_page,
+                    extra={"event": "admin_users", "admin": g.current_username, "page": page})
     return jsonify({
         "users": paginated_users,
         "page": page,
         "per_page": per_page,
         "total_users": total_users,
-        "total_pages": (total_users + per_page - 1) // per_page # Cálculo de teto para total_pages
+        "total_pages": (total_users + per_page - 1) // per_page, # Cálculo de teto para total_pages
+        "next_cursor": next_cursor
     }), 200
 
 @app.route('/api/admin/item', methods=['POST'])
@@ -314,17 +865,102 @@ def admin_add_item():
     if not data or not data.get('name') or not data.get('price') or not data.get('stock'):
         return jsonify({"message": "Name, price, stock required"}), 400
     item_id = str(uuid.uuid4())
-    items[item_id] = {
+    item = {
         "item_id": item_id, "name": data['name'], "description": data.get('description', ''),
         "price": float(data['price']), "stock": int(data['stock']),
-        "created_at": datetime.utcnow().isoformat()
+        "created_at": now_timestamp()
     }
-    return jsonify({"message": "Item added", "item": items[item_id]}), 201
+    item = store.add_item(item)
+    return jsonify({"message": "Item added", "item": item}), 201
+
+def read_bulk_rows(max_rows):
+    # Corpo JSON (lista ou {"items": [...]}) ou NDJSON (uma linha por registro, lido do stream).
+    # Devolve (rows, None) ou (None, resposta de erro); linhas NDJSON com JSON inválido viram None.
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = []
+        for line in request.stream:
+            if not line.strip(): continue
+            if len(rows) >= max_rows: return None, (jsonify({"message": f"Too many rows (max {max_rows})"}), 413)
+            try:
+                rows.append(app.json.loads(line))
+            except ValueError:
+                rows.append(None)
+        return rows, None
+    data = request.get_json(silent=True)
+    if isinstance(data, dict): data = data.get('items')
+    if not isinstance(data, list): return None, (jsonify({"message": "Expected a JSON array or NDJSON body"}), 400)
+    if len(data) > max_rows: return None, (jsonify({"message": f"Too many rows (max {max_rows})"}), 413)
+    return data, None
+
+def validate_item_fields(row, required=()):
+    # Devolve (campos válidos, None) ou (None, mensagem de erro)
+    fields = {}
+    if 'name' in row:
+        if not isinstance(row['name'], str) or not row['name'].strip(): return None, "Invalid name"
+        fields['name'] = row['name']
+    if 'description' in row:
+        if not isinstance(row['description'], str): return None, "Invalid description"
+        fields['description'] = row['description']
+    if 'price' in row:
+        price = row['price']
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0: return None, "Invalid price"
+        fields['price'] = float(price)
+    if 'stock' in row:
+        stock = row['stock']
+        if isinstance(stock, bool) or not isinstance(stock, int) or stock < 0: return None, "Invalid stock"
+        fields['stock'] = stock
+    missing = [field for field in required if field not in fields]
+    if missing: return None, f"Missing fields: {', '.join(missing)}"
+    return fields, None
+
+@app.route('/api/admin/items', methods=['POST'])
+@admin_required
+def admin_bulk_items():
+    # Importação/reposição em lote. Linhas sem item_id criam itens (name, price, stock obrigatórios);
+    # linhas com item_id atualizam os campos enviados (ex. {"item_id": ..., "stock": 120}).
+    # Linhas válidas são aplicadas mesmo que outras falhem; "results" traz o status de cada linha
+    # (row = posição na lista ou entre as linhas não vazias do NDJSON).
+    rows, error = read_bulk_rows(app.config['BULK_MAX_ROWS'])
+    if error: return error
+    now = now_timestamp()
+    results = [None] * len(rows)
+    new_items, new_rows, updates, update_rows = [], [], [], []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            results[index] = {"row": index, "status": 400, "message": "Invalid row"}
+            continue
+        item_id = row.get('item_id')
+        fields, message = validate_item_fields(row, () if item_id else ('name', 'price', 'stock'))
+        if item_id is not None and not isinstance(item_id, str): message = "Invalid item_id"
+        elif item_id and not fields and not message: message = "Nothing to update"
+        if message:
+            results[index] = {"row": index, "status": 400, "message": message}
+        elif item_id:
+            updates.append((item_id, {**fields, "updated_at": now}))
+            update_rows.append(index)
+        else:
+            new_items.append({"item_id": str(uuid.uuid4()), "name": fields['name'],
+                              "description": fields.get('description', ''), "price": fields['price'],
+                              "stock": fields['stock'], "created_at": now})
+            new_rows.append(index)
+
+    created_items = store.add_items(new_items)
+    for index, item in zip(new_rows, created_items):
+        results[index] = {"row": index, "status": 201, "item": item}
+    updated = store.update_items(updates) if updates else []
+    for index, item in zip(update_rows, updated):
+        results[index] = {"row": index, "status": 200, "item": item} if item else \
+            {"row": index, "status": 404, "message": "Item not found"}
+    updated_count = sum(1 for item in updated if item)
+    app.logger.info("Admin %s bulk import: %d created, %d updated.", g.current_username, len(new_items), updated_count,
+                    extra={"event": "admin_bulk_items", "admin": g.current_username})
+    return jsonify({"created": len(new_items), "updated": updated_count,
+                    "failed": len(rows) - len(new_items) - updated_count, "results": results}), 200
 
 @app.route('/api/admin/item/<item_id>/stock', methods=['PUT'])
 @admin_required
 def admin_update_item_stock(item_id):
-    if item_id not in items:
+    if store.get_item(item_id) is None:
         return jsonify({"message": "Item not found"}), 404
     
     data = request.get_json()
@@ -333,19 +969,29 @@ def admin_update_item_stock(item_id):
     if new_stock is None or not isinstance(new_stock, int) or new_stock < 0:
         return jsonify({"message": "Invalid stock value. 'stock' must be a non-negative integer."}), 400
     
-    items[item_id]['stock'] = new_stock
-    items[item_id]['updated_at'] = datetime.utcnow().isoformat()
-    app.logger.info(f"Admin {g.current_username} updated stock for item {item_id} ('{items[item_id]['name']}') to {new_stock}.")
-    return jsonify({"message": "Item stock updated successfully", "item": items[item_id]}), 200
+    item = store.update_item(item_id, stock=new_stock, updated_at=now_timestamp())
+    if item is None: return jsonify({"message": "Item not found"}), 404
+    app.logger.info("Admin %s updated stock for item %s ('%s') to %d.", g.current_username, item_id, item['name'],
+                    new_stock, extra={"event": "admin_stock", "admin": g.current_username, "item_id": item_id})
+    return jsonify({"message": "Item stock updated successfully", "item": item}), 200
 
 @app.route('/api/admin/item/<item_id>', methods=['DELETE'])
 @admin_required
 def admin_delete_item(item_id):
-    if item_id not in items: return jsonify({"message": "Item not found"}), 404
-    del items[item_id]
+    if not store.delete_item(item_id): return jsonify({"message": "Item not found"}), 404
     return jsonify({"message": "Item deleted"}), 200
 
 
+def shutdown_app():
+    # Libera recursos do processo ao encerrar (worker_exit do gunicorn, atexit no waitress e no servidor de dev)
+    password_hasher.close()
+    store.close() # com PERSIST_DIR, grava o snapshot final
+    log_pipeline.stop() # grava o que ainda estiver na fila
+
+
 if __name__ == '__main__':
+    # Servidor de desenvolvimento (um processo, sem tuning). Em produção use wsgi.py (gunicorn ou waitress).
+    # FLASK_DEBUG=1 liga o reloader e o debugger.
+    atexit.register(shutdown_app)
     port = int(os.environ.get("FLASK_RUN_PORT", 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
+    app.run(debug=os.environ.get("FLASK_DEBUG", "0") == "1", host='0.0.0.0', port=port, threaded=True)
@@ -0,0 +1,904 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+from itertools import count
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right, insort
+from search import CatalogIndex
+from persistence import Persistence
+from records import User, Item, Review, Order, TIMESTAMP_FIELDS, format_timestamp, parse_timestamp
+
+# --- Camada de armazenamento ---
+# Todos os endpoints acessam os dados por um "store". Há duas implementações com a mesma interface:
+#   MemoryStore: registros compactos (records.py) em dicionários na memória, um único processo
+#   SQLiteStore: arquivo SQLite em modo WAL, compartilhável entre vários workers
+# Nos dois, leituras devolvem dicts com timestamps em ISO 8601; na escrita, created_at/updated_at
+# chegam como inteiros (records.now_timestamp). Toda mutação passa pelos métodos do store.
+
+
+SEARCH_FIELDS = frozenset(('name', 'description', 'price')) # campos que exigem reindexar o item
+SNAPSHOT_VERSION = 1
+
+
+class MemoryStore:
+    # Estoque protegido por lock striping: cada item mapeia para um de ITEM_LOCK_STRIPES locks.
+    # Checkouts de itens diferentes não disputam o mesmo lock; um checkout com vários itens
+    # adquire os stripes em ordem crescente, o que evita deadlock.
+    ITEM_LOCK_STRIPES = 256
+
+    def __init__(self):
+        self.users = {}
+        self.items = {}
+        self.reviews = {}
+        self.carts = {}
+        self.orders = {}
+        self._catalog_versions = count(1)
+        self._catalog_version = 0
+        self._item_versions = {} # item_id -> versão do catálogo da última mudança no item (cache do carrinho)
+
+        # Índice ordenado de usernames, mantido incrementalmente no cadastro (evita sorted() por requisição)
+        self._user_index = []
+        self._users_lock = threading.Lock()
+        self._items_lock = threading.Lock()
+        self._item_locks = [threading.Lock() for _ in range(self.ITEM_LOCK_STRIPES)]
+        self._carts_lock = threading.Lock()
+        # Índices de busca (texto e preço). O lock é sempre o mais interno: é tomado dentro dos locks de itens.
+        self._catalog_index = CatalogIndex()
+        self._search_lock = threading.Lock()
+
+        # Reviews por item (ids na ordem de criação) e agregados de nota [quantidade, soma] por item
+        self._reviews_by_item = {}  # item_id -> [review_id]
+        self._review_pos = {}       # review_id -> posição na lista do item (cursor)
+        self._review_stats = {}     # item_id -> [count, sum]
+        self._reviews_lock = threading.Lock()
+
+        # Índices secundários de pedidos. Cada pedido recebe um seq (posição na ordem de criação);
+        # os índices guardam listas ordenadas de seq, então filtros e cursores usam bisect.
+        self._order_ids_by_seq = []      # seq -> order_id
+        self._order_created_by_seq = []  # seq -> created_at (timestamp, cresce junto com o seq)
+        self._order_seq = {}             # order_id -> seq
+        self._orders_by_status = {}      # status -> [seq]
+        self._orders_by_username = {}    # username -> [seq]
+        self._orders_lock = threading.Lock()
+
+        # Persistência opcional (persistence.py): cada mutação grava o registro resultante no journal,
+        # dentro do mesmo lock que a aplicou, então a ordem do journal segue a ordem das mutações
+        self._journal = None
+        self.persistence = None
+
+    def _log(self, *entry):
+        if self._journal is not None: self._journal.append(entry)
+
+    # USERS
+    def get_user(self, username):
+        user = self.users.get(username)
+        return user.to_dict() if user is not None else None
+
+    def add_user(self, username, user_data):
+        user = User.from_dict(user_data)
+        with self._users_lock:
+            if username in self.users: return False
+            self.users[username] = user
+            insort(self._user_index, username)
+            self._log('user', username, user)
+            return True
+
+    def update_user(self, username, **fields):
+        with self._users_lock:
+            user = self.users.get(username)
+            if user is None: return False
+            user.update(fields) # leitores recebem cópias (to_dict), então alterar no lugar é seguro
+            self._log('user', username, user)
+            return True
+
+    def count_users(self):
+        return len(self._user_index)
+
+    def list_users(self, offset=0, after=None, limit=50):
+        start = bisect_right(self._user_index, after) if after is not None else offset
+        return [(username, self.users[username].to_dict()) for username in self._user_index[start:start + limit]]
+
+    # ITEMS
+    def catalog_version(self):
+        return self._catalog_version
+
+    def item_versions(self, item_ids):
+        # {item_id: versão} da última mudança de cada item (None se não existe). Lida antes dos itens:
+        # se o item mudar no meio, quem guardou a versão com os dados já fica com uma entrada vencida.
+        items, versions = self.items, self._item_versions
+        return {item_id: versions.get(item_id, 0) if item_id in items else None for item_id in item_ids}
+
+    def get_item(self, item_id):
+        item = self.items.get(item_id)
+        return item.to_dict() if item is not None else None
+
+    def get_items(self, item_ids):
+        # {item_id: item} dos que existem
+        found = {}
+        for item_id in item_ids:
+            item = self.items.get(item_id)
+            if item is not None: found[item_id] = item.to_dict()
+        return found
+
+    def list_items(self):
+        return [item.to_dict() for item in list(self.items.values())]
+
+    def count_items(self):
+        return len(self.items)
+
+    def _bump_catalog_version(self, item_ids=()):
+        version = self._catalog_version = next(self._catalog_versions) # next() em itertools.count é atômico
+        for item_id in item_ids: self._item_versions[item_id] = version
+
+    def _item_lock(self, item_id):
+        return self._item_locks[hash(item_id) % self.ITEM_LOCK_STRIPES]
+
+    @contextmanager
+    def _locked_items(self, item_ids):
+        # Trava os stripes de vários itens de uma vez, sempre em ordem crescente
+        stripes = sorted({hash(item_id) % self.ITEM_LOCK_STRIPES for item_id in item_ids})
+        for stripe in stripes: self._item_locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes): self._item_locks[stripe].release()
+
+    def _index_item(self, item):
+        self._catalog_index.add(item.item_id, item.name, item.description, item.price)
+
+    def add_item(self, item):
+        # Devolve o item como ficou gravado (timestamps em ISO)
+        item = Item.from_dict(item)
+        with self._items_lock:
+            self.items[item.item_id] = item
+            with self._search_lock: self._index_item(item)
+            self._log('item', item)
+        self._bump_catalog_version((item.item_id,))
+        return item.to_dict()
+
+    def add_items(self, items, if_empty=False):
+        # if_empty: carga inicial, só grava se o catálogo estiver vazio (checagem e escrita atômicas);
+        # devolve None se já havia itens
+        items = [Item.from_dict(item) for item in items]
+        with self._items_lock:
+            if if_empty and self.items: return None
+            with self._search_lock:
+                for item in items:
+                    self.items[item.item_id] = item
+                    self._index_item(item)
+            for item in items: self._log('item', item)
+        if items: self._bump_catalog_version(item.item_id for item in items)
+        return [item.to_dict() for item in items]
+
+    def update_item(self, item_id, **fields):
+        with self._item_lock(item_id):
+            item = self.items.get(item_id)
+            if item is None: return None
+            item.update(fields)
+            if SEARCH_FIELDS.intersection(fields):
+                with self._search_lock: self._index_item(item)
+            self._log('item', item)
+            item = item.to_dict()
+        self._bump_catalog_version((item_id,))
+        return item
+
+    def update_items(self, updates):
+        # updates: [(item_id, campos)]. Aplica o lote com os stripes travados uma única vez e
+        # devolve, na mesma ordem, o item atualizado ou None se não existir.
+        with self._locked_items(item_id for item_id, _ in updates):
+            results = []
+            for item_id, fields in updates:
+                item = self.items.get(item_id)
+                if item is not None:
+                    item.update(fields)
+                    if SEARCH_FIELDS.intersection(fields):
+                        with self._search_lock: self._index_item(item)
+                    self._log('item', item)
+                    item = item.to_dict()
+                results.append(item)
+        if any(item is not None for item in results):
+            self._bump_catalog_version(item['item_id'] for item in results if item is not None)
+        return results
+
+    def delete_item(self, item_id):
+        with self._item_lock(item_id), self._items_lock:
+            if self.items.pop(item_id, None) is None: return False
+            with self._search_lock: self._catalog_index.remove(item_id)
+            self._log('item_deleted', item_id)
+        self._bump_catalog_version((item_id,))
+        return True
+
+    def search_items(self, terms, min_price=None, max_price=None, in_stock=False, offset=0, limit=50):
+        # (página de itens, total). O estoque é conferido no item, então checkouts não mexem nos índices.
+        with self._search_lock:
+            item_ids = self._catalog_index.search(terms, min_price, max_price)
+        matches = [item for item in map(self.items.get, item_ids)
+                   if item is not None and (not in_stock or item.stock > 0)]
+        return [item.to_dict() for item in matches[offset:offset + limit]], len(matches)
+
+    def reserve_stock(self, lines):
+        # Reserva tudo ou nada: com os stripes travados, valida todas as linhas antes de decrementar.
+        # Retorna (snapshots dos itens, None) ou (None, item_id que falhou).
+        with self._locked_items(lines):
+            for item_id, quantity in lines.items():
+                item = self.items.get(item_id)
+                if item is None or item.stock < quantity: return None, item_id
+            snapshots = {}
+            for item_id, quantity in lines.items():
+                item = self.items[item_id]
+                item.stock -= quantity
+                snapshots[item_id] = item.to_dict()
+                self._log('item', item)
+        self._bump_catalog_version(lines)
+        return snapshots, None
+
+    def release_stock(self, lines):
+        with self._locked_items(lines):
+            for item_id, quantity in lines.items():
+                item = self.items.get(item_id)
+                if item is not None:
+                    item.stock += quantity
+                    self._log('item', item)
+        self._bump_catalog_version(lines)
+
+    # REVIEWS
+    def add_review(self, review_id, review):
+        review = Review.from_dict(review)
+        with self._reviews_lock:
+            self._put_review(review_id, review)
+            self._log('review', review_id, review)
+
+    def _put_review(self, review_id, review):
+        if review_id in self.reviews: return # reviews não mudam depois de criadas
+        self.reviews[review_id] = review
+        review_ids = self._reviews_by_item.setdefault(review.item_id, [])
+        self._review_pos[review_id] = len(review_ids)
+        review_ids.append(review_id)
+        stats = self._review_stats.setdefault(review.item_id, [0, 0])
+        stats[0] += 1
+        stats[1] += review.rating
+
+    def get_review(self, review_id):
+        review = self.reviews.get(review_id)
+        return review.to_dict() if review is not None else None
+
+    def review_stats(self, item_id):
+        # (quantidade, soma das notas)
+        return tuple(self._review_stats.get(item_id, (0, 0)))
+
+    def list_reviews(self, item_id, offset=0, after=None, limit=50):
+        review_ids = self._reviews_by_item.get(item_id, [])
+        start = self._review_pos[after] + 1 if after is not None else offset
+        return [{"review_id": review_id, **self.reviews[review_id].to_dict()} for review_id in review_ids[start:start + limit]]
+
+    # CARTS
+    def get_cart(self, username):
+        return dict(self.carts.get(username, {}))
+
+    def add_to_cart(self, username, item_id, quantity):
+        with self._carts_lock:
+            cart = self.carts.setdefault(username, {})
+            cart[item_id] = cart.get(item_id, 0) + quantity
+            self._log('cart', username, cart)
+            return dict(cart)
+
+    def add_many_to_cart(self, username, lines):
+        with self._carts_lock:
+            cart = self.carts.setdefault(username, {})
+            for item_id, quantity in lines.items():
+                cart[item_id] = cart.get(item_id, 0) + quantity
+            self._log('cart', username, cart)
+            return dict(cart)
+
+    def remove_from_cart(self, username, item_id):
+        with self._carts_lock:
+            cart = self.carts.get(username, {})
+            if item_id not in cart: return None
+            del cart[item_id]
+            self._log('cart', username, cart)
+            return dict(cart)
+
+    def clear_cart(self, username):
+        with self._carts_lock:
+            self.carts[username] = {}
+            self._log('cart', username, {})
+
+    # ORDERS
+    def get_order(self, order_id):
+        order = self.orders.get(order_id)
+        return order.to_dict() if order is not None else None
+
+    def count_orders(self, username=None, status=None, created_from=None, created_to=None):
+        # Mesmos filtros de iter_orders, contados pelos índices (sem montar os pedidos)
+        created = self._order_created_by_seq
+        lo = bisect_left(created, parse_timestamp(created_from)) if created_from else 0
+        hi = bisect_left(created, parse_timestamp(created_to)) if created_to else len(created)
+        if username is None and status is None: return hi - lo
+        if status is None: candidates = self._orders_by_username.get(username, [])
+        elif username is None: candidates = self._orders_by_status.get(status, [])
+        else: candidates = min(self._orders_by_username.get(username, []), self._orders_by_status.get(status, []), key=len)
+        start, end = bisect_left(candidates, lo), bisect_left(candidates, hi)
+        if username is None or status is None: return end - start
+        # Os dois filtros: percorre o menor índice e confere os dois campos no registro
+        return sum(1 for seq in candidates[start:end]
+                   if (order := self.orders[self._order_ids_by_seq[seq]]).username == username and order.status == status)
+
+    def list_user_orders(self, username, offset=0, after=None, limit=50):
+        # Pedidos de um usuário em ordem de criação; after = order_id do último pedido da página anterior
+        seqs = self._orders_by_username.get(username, [])
+        start = bisect_right(seqs, self._order_seq[after]) if after is not None else offset
+        return [self.orders[self._order_ids_by_seq[seq]].to_dict() for seq in seqs[start:start + limit]]
+
+    def add_order(self, order):
+        order = Order.from_dict(order)
+        with self._orders_lock:
+            # O created_at vem de antes do lock: checkouts concorrentes podem chegar fora de ordem. Ajusta
+            # para o último da lista, que precisa ficar ordenada para o bisect de iter_orders/count_orders.
+            created = self._order_created_by_seq
+            if created and order.created_at < created[-1]: order.created_at = created[-1]
+            self._put_order(order)
+            self._log('order', order)
+
+    def _put_order(self, order):
+        current = self.orders.get(order.order_id)
+        if current is not None: # replay de um pedido já conhecido: troca o registro e, se mudou, o status
+            if current.status != order.status: self._move_order_status(order.order_id, current.status, order.status)
+            self.orders[order.order_id] = order
+            return
+        seq = len(self._order_ids_by_seq)
+        self.orders[order.order_id] = order
+        self._order_ids_by_seq.append(order.order_id)
+        self._order_created_by_seq.append(order.created_at)
+        self._order_seq[order.order_id] = seq
+        self._orders_by_status.setdefault(order.status, []).append(seq)
+        self._orders_by_username.setdefault(order.username, []).append(seq)
+
+    def _move_order_status(self, order_id, old_status, status):
+        seq = self._order_seq[order_id]
+        old_index = self._orders_by_status[old_status]
+        del old_index[bisect_left(old_index, seq)]
+        insort(self._orders_by_status.setdefault(status, []), seq)
+
+    def set_order_status(self, order_id, status, expected_status=None, **fields):
+        with self._orders_lock:
+            order = self.orders.get(order_id)
+            if order is None: return False
+            if expected_status is not None and order.status != expected_status: return False
+            self._move_order_status(order_id, order.status, status)
+            order.status = sys.intern(status)
+            order.update(fields)
+            self._log('order', order)
+            return True
+
+    def iter_orders(self, status=None, username=None, created_from=None, created_to=None, after=None):
+        # created_from é inclusivo e created_to exclusivo (strings ISO, comparadas como timestamps)
+        created = self._order_created_by_seq
+        lo = bisect_left(created, parse_timestamp(created_from)) if created_from else 0
+        hi = bisect_left(created, parse_timestamp(created_to)) if created_to else len(created)
+        start = lo if after is None else max(lo, self._order_seq[after] + 1)
+        if username is not None: candidates = self._orders_by_username.get(username, [])
+        elif status is not None: candidates = self._orders_by_status.get(status, [])
+        else:
+            for seq in range(start, hi):
+                yield self.orders[self._order_ids_by_seq[seq]].to_dict()
+            return
+        # Re-localiza com bisect a cada passo: tolera mudanças de status durante a iteração
+        idx = bisect_left(candidates, start)
+        while idx < len(candidates):
+            seq = candidates[idx]
+            if seq >= hi: break
+            order = self.orders[self._order_ids_by_seq[seq]]
+            if status is None or order.status == status:
+                yield order.to_dict()
+            idx = bisect_right(candidates, seq)
+
+    # PERSISTÊNCIA (usado por persistence.py)
+    def attach_journal(self, journal):
+        self._journal = journal
+
+    def close(self):
+        if self.persistence is not None: self.persistence.close()
+
+    def snapshot_state(self, rotate):
+        # Cópia rasa das coleções e troca do journal no mesmo instante, com os locks de inclusão/remoção
+        # tomados. Os registros são serializados depois, fora dos locks: um registro alterado nesse meio
+        # tempo sai já atualizado, e a entrada dele no journal novo reaplica o mesmo estado.
+        with self._users_lock, self._items_lock, self._reviews_lock, self._carts_lock, self._orders_lock:
+            generation = rotate()
+            return {"version": SNAPSHOT_VERSION, "journal": generation, "users": list(self.users.items()),
+                    "items": list(self.items.values()), "reviews": list(self.reviews.items()),
+                    "carts": {username: dict(cart) for username, cart in self.carts.items()},
+                    "orders": list(self.orders.values())}
+
+    def restore(self, state):
+        # Carrega um snapshot num store vazio, reconstruindo os índices em lote
+        if state.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {state.get('version')!r}")
+        self.users = dict(state["users"])
+        self._user_index = sorted(self.users)
+        self.items = {item.item_id: item for item in state["items"]}
+        self._catalog_index.add_many((item.item_id, item.name, item.description, item.price)
+                                     for item in self.items.values())
+        for review_id, review in state["reviews"]: self._put_review(review_id, review)
+        self.carts = state["carts"]
+        for order in state["orders"]: self._put_order(order)
+        self._bump_catalog_version()
+
+    def apply(self, entry):
+        # Uma entrada do journal (replay na inicialização, antes de atender requisições)
+        kind = entry[0]
+        if kind == 'user':
+            if entry[1] not in self.users: insort(self._user_index, entry[1])
+            self.users[entry[1]] = entry[2]
+        elif kind == 'item':
+            self.items[entry[1].item_id] = entry[1]
+            self._index_item(entry[1])
+        elif kind == 'item_deleted':
+            if self.items.pop(entry[1], None) is not None: self._catalog_index.remove(entry[1])
+        elif kind == 'review': self._put_review(entry[1], entry[2])
+        elif kind == 'cart': self.carts[entry[1]] = entry[2]
+        elif kind == 'order': self._put_order(entry[1])
+        else: raise ValueError(f"Unknown journal entry: {kind!r}")
+        self._bump_catalog_version()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_version', 0), ('user_count', 0), ('order_count', 0);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY, password_hash TEXT NOT NULL, email TEXT, full_name TEXT,
+    address TEXT, is_admin INTEGER NOT NULL DEFAULT 0, created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    item_id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT, price REAL NOT NULL,
+    stock INTEGER NOT NULL, created_at TEXT NOT NULL, updated_at TEXT,
+    version INTEGER NOT NULL DEFAULT 0 -- incrementada a cada UPDATE do item (cache do carrinho)
+);
+CREATE INDEX IF NOT EXISTS items_price ON items (price, item_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    name, description, content='items', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, name, description) VALUES ('delete', old.rowid, old.name, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF name, description ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, name, description) VALUES ('delete', old.rowid, old.name, old.description);
+    INSERT INTO items_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+END;
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id TEXT PRIMARY KEY, item_id TEXT NOT NULL, username TEXT NOT NULL, rating,
+    comment TEXT, created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_item ON reviews (item_id);
+CREATE TABLE IF NOT EXISTS review_stats (
+    item_id TEXT PRIMARY KEY, review_count INTEGER NOT NULL, rating_sum REAL NOT NULL
+);
+INSERT OR IGNORE INTO review_stats (item_id, review_count, rating_sum)
+    SELECT item_id, COUNT(*), TOTAL(rating) FROM reviews WHERE NOT EXISTS (SELECT 1 FROM review_stats) GROUP BY item_id;
+CREATE TABLE IF NOT EXISTS cart_items (
+    username TEXT NOT NULL, item_id TEXT NOT NULL, quantity INTEGER NOT NULL,
+    UNIQUE (username, item_id)
+);
+CREATE TABLE IF NOT EXISTS orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, order_id TEXT NOT NULL UNIQUE, username TEXT NOT NULL,
+    items TEXT NOT NULL, total_amount REAL NOT NULL, shipping_address TEXT, status TEXT NOT NULL,
+    created_at TEXT NOT NULL, payment_method TEXT, payment_details_masked TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_status ON orders (status, seq);
+CREATE INDEX IF NOT EXISTS orders_username ON orders (username, seq);
+CREATE INDEX IF NOT EXISTS orders_created_at ON orders (created_at);
+"""
+
+class _ReservationFailed(Exception):
+    def __init__(self, item_id):
+        super().__init__(item_id)
+        self.item_id = item_id
+
+
+USER_FIELDS = ('password_hash', 'email', 'full_name', 'address', 'is_admin', 'created_at')
+ITEM_FIELDS = ('item_id', 'name', 'description', 'price', 'stock', 'created_at', 'updated_at')
+ORDER_FIELDS = ('order_id', 'username', 'items', 'total_amount', 'shipping_address', 'status', 'created_at',
+                'payment_method', 'payment_details_masked')
+ORDER_COLUMNS = 'seq, ' + ', '.join(ORDER_FIELDS)
+
+
+class SQLiteStore:
+    # Uma conexão por thread (e por processo: conexões herdadas via fork não são reutilizadas).
+    # O sqlite3 mantém um cache de statements por conexão, então as queries parametrizadas
+    # abaixo são preparadas uma única vez por conexão.
+    ORDERS_BATCH = 500
+    IDS_BATCH = 500 # parâmetros por consulta IN (...)
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'").fetchone()
+        # Banco criado antes da coluna version
+        columns = [row['name'] for row in conn.execute("PRAGMA table_info(items)")]
+        if columns and 'version' not in columns:
+            conn.execute("ALTER TABLE items ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.executescript(SCHEMA)
+        # Banco criado antes do índice de busca: indexa os itens existentes uma vez
+        if not has_fts: conn.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+
+    def close(self):
+        pass # conexões são por thread e fecham com o processo; os dados já estão no arquivo
+
+    def _conn(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=OFF")
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    class _Transaction:
+        def __init__(self, conn): self.conn = conn
+        def __enter__(self):
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self.conn
+        def __exit__(self, exc_type, exc, tb):
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+    def _write(self):
+        return self._Transaction(self._conn())
+
+    def _bump_catalog_version(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'")
+
+    @staticmethod
+    def _stored(record):
+        # Timestamps inteiros viram texto ISO 8601 no banco: mantém o formato de bancos já existentes
+        # e o filtro por created_at como comparação de strings
+        return {field: format_timestamp(value) if field in TIMESTAMP_FIELDS and isinstance(value, int) else value
+                for field, value in record.items()}
+
+    @staticmethod
+    def _user(row):
+        user = dict(row)
+        user['is_admin'] = bool(user['is_admin'])
+        return user
+
+    @staticmethod
+    def _item(row):
+        item = dict(row)
+        if item['updated_at'] is None: del item['updated_at']
+        return item
+
+    @staticmethod
+    def _order(row):
+        order = {field: row[field] for field in ORDER_FIELDS if row[field] is not None}
+        order['items'] = json.loads(order['items'])
+        return order
+
+    # USERS
+    def get_user(self, username):
+        row = self._conn().execute(
+            "SELECT password_hash, email, full_name, address, is_admin, created_at FROM users WHERE username = ?",
+            (username,)).fetchone()
+        return self._user(row) if row else None
+
+    def add_user(self, username, user_data):
+        user_data = self._stored(user_data)
+        with self._write() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO users (username, password_hash, email, full_name, address, is_admin, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (username, user_data['password_hash'], user_data.get('email'), user_data.get('full_name'),
+                 user_data.get('address'), int(bool(user_data.get('is_admin'))), user_data['created_at']))
+            if cursor.rowcount == 0: return False
+            # COUNT(*) no SQLite é O(n); o total é mantido como contador
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'user_count'")
+            return True
+
+    def update_user(self, username, **fields):
+        fields = {field: value for field, value in fields.items() if field in USER_FIELDS}
+        if not fields: return self.get_user(username) is not None
+        with self._write() as conn:
+            return conn.execute(f"UPDATE users SET {', '.join(f'{field} = ?' for field in fields)} WHERE username = ?",
+                                (*fields.values(), username)).rowcount > 0
+
+    def count_users(self):
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'user_count'").fetchone()[0]
+
+    def list_users(self, offset=0, after=None, limit=50):
+        columns = "username, password_hash, email, full_name, address, is_admin, created_at"
+        if after is not None:
+            rows = self._conn().execute(
+                f"SELECT {columns} FROM users WHERE username > ? ORDER BY username LIMIT ?", (after, limit))
+        else:
+            rows = self._conn().execute(
+                f"SELECT {columns} FROM users ORDER BY username LIMIT ? OFFSET ?", (limit, offset))
+        result = []
+        for row in rows:
+            user = self._user(row)
+            result.append((user.pop('username'), user))
+        return result
+
+    # ITEMS
+    def catalog_version(self):
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'catalog_version'").fetchone()[0]
+
+    def item_versions(self, item_ids):
+        # {item_id: versão} (None se não existe); em lotes como get_items
+        item_ids = list(item_ids)
+        versions = dict.fromkeys(item_ids)
+        for start in range(0, len(item_ids), self.IDS_BATCH):
+            batch = item_ids[start:start + self.IDS_BATCH]
+            versions.update(self._conn().execute(f"SELECT item_id, version FROM items WHERE item_id IN "
+                                                 f"({', '.join('?' * len(batch))})", batch).fetchall())
+        return versions
+
+    def get_item(self, item_id):
+        row = self._conn().execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items WHERE item_id = ?", (item_id,)).fetchone()
+        return self._item(row) if row else None
+
+    def get_items(self, item_ids):
+        # Uma query por lote de ids (o SQLite limita o número de parâmetros por statement)
+        item_ids, items = list(item_ids), {}
+        for start in range(0, len(item_ids), self.IDS_BATCH):
+            batch = item_ids[start:start + self.IDS_BATCH]
+            rows = self._conn().execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items WHERE item_id IN "
+                                        f"({', '.join('?' * len(batch))})", batch)
+            for row in rows: items[row['item_id']] = self._item(row)
+        return items
+
+    def list_items(self):
+        return [self._item(row) for row in
+                self._conn().execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items ORDER BY rowid")]
+
+    def count_items(self):
+        return self._conn().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def add_item(self, item):
+        item = self._stored(item)
+        with self._write() as conn:
+            conn.execute(f"INSERT INTO items ({', '.join(ITEM_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         tuple(item.get(field) for field in ITEM_FIELDS))
+            self._bump_catalog_version(conn)
+        return item
+
+    def add_items(self, items, if_empty=False):
+        items = [self._stored(item) for item in items]
+        if not items: return items
+        with self._write() as conn:
+            # BEGIN IMMEDIATE já tem o lock de escrita: outro worker não insere entre a checagem e o INSERT
+            if if_empty and conn.execute("SELECT 1 FROM items LIMIT 1").fetchone(): return None
+            conn.executemany(f"INSERT INTO items ({', '.join(ITEM_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             [tuple(item.get(field) for field in ITEM_FIELDS) for item in items])
+            self._bump_catalog_version(conn)
+        return items
+
+    def update_item(self, item_id, **fields):
+        fields = self._stored(fields)
+        assignments = ', '.join(f"{field} = ?" for field in fields if field in ITEM_FIELDS[1:])
+        with self._write() as conn:
+            if assignments:
+                cursor = conn.execute(f"UPDATE items SET {assignments}, version = version + 1 WHERE item_id = ?",
+                                      (*(value for field, value in fields.items() if field in ITEM_FIELDS[1:]), item_id))
+                if cursor.rowcount == 0: return None
+                self._bump_catalog_version(conn)
+            row = conn.execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items WHERE item_id = ?", (item_id,)).fetchone()
+            return self._item(row) if row else None
+
+    def update_items(self, updates):
+        # Uma transação para o lote inteiro
+        results = []
+        with self._write() as conn:
+            for item_id, fields in updates:
+                fields = {field: value for field, value in self._stored(fields).items() if field in ITEM_FIELDS[1:]}
+                if fields:
+                    conn.execute(f"UPDATE items SET {', '.join(f'{field} = ?' for field in fields)}, version = version + 1 "
+                                 "WHERE item_id = ?",
+                                 (*fields.values(), item_id))
+                row = conn.execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items WHERE item_id = ?",
+                                   (item_id,)).fetchone()
+                results.append(self._item(row) if row else None)
+            if any(item is not None for item in results): self._bump_catalog_version(conn)
+        return results
+
+    def delete_item(self, item_id):
+        with self._write() as conn:
+            if conn.execute("DELETE FROM items WHERE item_id = ?", (item_id,)).rowcount == 0: return False
+            self._bump_catalog_version(conn)
+            return True
+
+    def search_items(self, terms, min_price=None, max_price=None, in_stock=False, offset=0, limit=50):
+        # Os triggers mantêm items_fts em dia; o trigger de update só dispara para name/description,
+        # então mudanças de estoque (checkout, reposição) não tocam no índice de texto
+        conditions, params = [], []
+        if terms:
+            conditions.append("rowid IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)")
+            params.append(' '.join(f'"{term}"' for term in terms))
+        if min_price is not None:
+            conditions.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("price <= ?")
+            params.append(max_price)
+        if in_stock: conditions.append("stock > 0")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM items {where}", params).fetchone()[0]
+        rows = conn.execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items {where} ORDER BY price, item_id LIMIT ? OFFSET ?",
+                            (*params, limit, offset))
+        return [self._item(row) for row in rows], total
+
+    def reserve_stock(self, lines):
+        # Uma transação BEGIN IMMEDIATE: o UPDATE condicional faz o compare-and-swap de cada linha
+        # e qualquer falha desfaz as anteriores (tudo ou nada, inclusive entre processos).
+        try:
+            with self._write() as conn:
+                snapshots = {}
+                for item_id, quantity in lines.items():
+                    cursor = conn.execute("UPDATE items SET stock = stock - ?, version = version + 1 WHERE item_id = ? AND stock >= ?",
+                                          (quantity, item_id, quantity))
+                    if cursor.rowcount == 0: raise _ReservationFailed(item_id)
+                    row = conn.execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items WHERE item_id = ?",
+                                       (item_id,)).fetchone()
+                    snapshots[item_id] = self._item(row)
+                self._bump_catalog_version(conn)
+        except _ReservationFailed as failure:
+            return None, failure.item_id
+        return snapshots, None
+
+    def release_stock(self, lines):
+        with self._write() as conn:
+            conn.executemany("UPDATE items SET stock = stock + ?, version = version + 1 WHERE item_id = ?",
+                             [(quantity, item_id) for item_id, quantity in lines.items()])
+            self._bump_catalog_version(conn)
+
+    # REVIEWS
+    def add_review(self, review_id, review):
+        review = self._stored(review)
+        with self._write() as conn:
+            conn.execute("INSERT INTO reviews (review_id, item_id, username, rating, comment, created_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (review_id, review['item_id'], review['username'], review['rating'], review['comment'],
+                          review['created_at']))
+            conn.execute("INSERT INTO review_stats (item_id, review_count, rating_sum) VALUES (?, 1, ?) "
+                         "ON CONFLICT (item_id) DO UPDATE SET review_count = review_count + 1, "
+                         "rating_sum = rating_sum + excluded.rating_sum", (review['item_id'], review['rating']))
+
+    def get_review(self, review_id):
+        row = self._conn().execute(
+            "SELECT item_id, username, rating, comment, created_at FROM reviews WHERE review_id = ?",
+            (review_id,)).fetchone()
+        return dict(row) if row else None
+
+    def review_stats(self, item_id):
+        row = self._conn().execute(
+            "SELECT review_count, rating_sum FROM review_stats WHERE item_id = ?", (item_id,)).fetchone()
+        return (row['review_count'], row['rating_sum']) if row else (0, 0)
+
+    def list_reviews(self, item_id, offset=0, after=None, limit=50):
+        # O índice (item_id) inclui o rowid, então a ordem por rowid sai do próprio índice
+        columns = "review_id, item_id, username, rating, comment, created_at"
+        if after is not None:
+            rows = self._conn().execute(
+                f"SELECT {columns} FROM reviews WHERE item_id = ? AND rowid > "
+                "(SELECT rowid FROM reviews WHERE review_id = ?) ORDER BY rowid LIMIT ?", (item_id, after, limit))
+        else:
+            rows = self._conn().execute(
+                f"SELECT {columns} FROM reviews WHERE item_id = ? ORDER BY rowid LIMIT ? OFFSET ?",
+                (item_id, limit, offset))
+        return [dict(row) for row in rows]
+
+    # CARTS
+    def get_cart(self, username):
+        rows = self._conn().execute(
+            "SELECT item_id, quantity FROM cart_items WHERE username = ? ORDER BY rowid", (username,))
+        return {row['item_id']: row['quantity'] for row in rows}
+
+    def add_to_cart(self, username, item_id, quantity):
+        with self._write() as conn:
+            conn.execute("INSERT INTO cart_items (username, item_id, quantity) VALUES (?, ?, ?) "
+                         "ON CONFLICT (username, item_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+                         (username, item_id, quantity))
+        return self.get_cart(username)
+
+    def add_many_to_cart(self, username, lines):
+        with self._write() as conn:
+            conn.executemany("INSERT INTO cart_items (username, item_id, quantity) VALUES (?, ?, ?) "
+                             "ON CONFLICT (username, item_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+                             [(username, item_id, quantity) for item_id, quantity in lines.items()])
+        return self.get_cart(username)
+
+    def remove_from_cart(self, username, item_id):
+        with self._write() as conn:
+            if conn.execute("DELETE FROM cart_items WHERE username = ? AND item_id = ?",
+                            (username, item_id)).rowcount == 0:
+                return None
+        return self.get_cart(username)
+
+    def clear_cart(self, username):
+        with self._write() as conn:
+            conn.execute("DELETE FROM cart_items WHERE username = ?", (username,))
+
+    # ORDERS
+    def get_order(self, order_id):
+        row = self._conn().execute(f"SELECT {ORDER_COLUMNS} FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return self._order(row) if row else None
+
+    @staticmethod
+    def _order_filters(status, username, created_from, created_to):
+        conditions, params = [], []
+        for column, op, value in (('status', '=', status), ('username', '=', username),
+                                  ('created_at', '>=', created_from), ('created_at', '<', created_to)):
+            if value:
+                conditions.append(f"{column} {op} ?")
+                params.append(value)
+        return conditions, params
+
+    def count_orders(self, username=None, status=None, created_from=None, created_to=None):
+        conditions, params = self._order_filters(status, username, created_from, created_to)
+        if not conditions: # COUNT(*) sem filtro é O(n); o total é mantido como contador
+            return self._conn().execute("SELECT value FROM meta WHERE key = 'order_count'").fetchone()[0]
+        return self._conn().execute(f"SELECT COUNT(*) FROM orders WHERE {' AND '.join(conditions)}", params).fetchone()[0]
+
+    def list_user_orders(self, username, offset=0, after=None, limit=50):
+        if after is not None:
+            rows = self._conn().execute(
+                f"SELECT {ORDER_COLUMNS} FROM orders WHERE username = ? AND seq > "
+                "(SELECT seq FROM orders WHERE order_id = ?) ORDER BY seq LIMIT ?", (username, after, limit))
+        else:
+            rows = self._conn().execute(
+                f"SELECT {ORDER_COLUMNS} FROM orders WHERE username = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (username, limit, offset))
+        return [self._order(row) for row in rows]
+
+    def add_order(self, order):
+        values = dict(self._stored(order), items=json.dumps(order['items']))
+        with self._write() as conn:
+            conn.execute(f"INSERT INTO orders ({', '.join(ORDER_FIELDS)}) VALUES ({', '.join('?' * len(ORDER_FIELDS))})",
+                         tuple(values.get(field) for field in ORDER_FIELDS))
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'order_count'")
+
+    def set_order_status(self, order_id, status, expected_status=None, **fields):
+        fields = {field: value for field, value in fields.items() if field in ORDER_FIELDS}
+        assignments = ''.join(f", {field} = ?" for field in fields)
+        sql = f"UPDATE orders SET status = ?{assignments} WHERE order_id = ?"
+        params = [status, *fields.values(), order_id]
+        if expected_status is not None:
+            sql += " AND status = ?"
+            params.append(expected_status)
+        with self._write() as conn:
+            return conn.execute(sql, params).rowcount > 0
+
+    def iter_orders(self, status=None, username=None, created_from=None, created_to=None, after=None):
+        # Paginação por keyset em lotes: cada lote é uma query curta, sem manter uma transação aberta
+        conditions, params = self._order_filters(status, username, created_from, created_to)
+        last_seq = 0
+        if after is not None:
+            row = self._conn().execute("SELECT seq FROM orders WHERE order_id = ?", (after,)).fetchone()
+            last_seq = row['seq'] if row else 0
+        where = ' AND '.join(conditions + ["seq > ?"])
+        sql = f"SELECT {ORDER_COLUMNS} FROM orders WHERE {where} ORDER BY seq LIMIT {self.ORDERS_BATCH}"
+        while True:
+            rows = self._conn().execute(sql, (*params, last_seq)).fetchall()
+            for row in rows:
+                yield self._order(row)
+            if len(rows) < self.ORDERS_BATCH: return
+            last_seq = rows[-1]['seq']
+
+
+def create_store(config):
+    backend = config.get('STORAGE_BACKEND', 'memory')
+    if backend == 'memory':
+        store = MemoryStore()
+        if config.get('PERSIST_DIR'):
+            store.persistence = Persistence(store, config['PERSIST_DIR'], config.get('PERSIST_FSYNC_INTERVAL', 0.05),
+                                            config.get('PERSIST_SNAPSHOT_INTERVAL', 300))
+        return store
+    if backend == 'sqlite':
+        return SQLiteStore(config['SQLITE_PATH'])
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend!r} (expected 'memory' or 'sqlite')")
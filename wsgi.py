@@ -0,0 +1,27 @@
+import os
+import sys
+import atexit
+import signal
+from server import app, shutdown_app
+
+# --- Ponto de entrada WSGI para produção ---
+#   gunicorn -c gunicorn.conf.py wsgi:app    (Linux/macOS; workers e threads em gunicorn.conf.py)
+#   python wsgi.py                           (waitress; funciona também no Windows)
+# Com STORAGE_BACKEND=memory os dados ficam no processo: mais de um worker do gunicorn exige sqlite.
+
+
+def serve_waitress():
+    from waitress import serve
+    atexit.register(shutdown_app)
+    # SIGTERM vira SystemExit: o waitress para de aceitar conexões e espera as requisições em andamento
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    serve(app, host=os.environ.get('WEB_HOST', '0.0.0.0'), port=int(os.environ.get('FLASK_RUN_PORT', 5000)),
+          threads=int(os.environ.get('WEB_THREADS', 8)),
+          channel_timeout=int(os.environ.get('WEB_KEEPALIVE', 5)), # fecha conexões keep-alive ociosas
+          connection_limit=int(os.environ.get('WEB_CONNECTION_LIMIT', 1000)),
+          backlog=int(os.environ.get('WEB_BACKLOG', 2048)),
+          ident=None)
+
+
+if __name__ == '__main__':
+    serve_waitress()